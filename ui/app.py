@@ -1,17 +1,17 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-from authentication import authentication_page
-from form_page import form_page
-from fitness_plan_page import fitness_plan, progress_tracking
-from database_page import database
+import startup
+import tracing
 
+# Pages are imported on first use (startup.load_page): the login screen needs
+# neither pandas nor the models.
 st.set_page_config(page_title="Fitness Coach Agent", layout='wide')
 
 with st.sidebar:
     selected = option_menu(
         menu_title="Fitness Coach Agent",  
-        options=["My Fitness Plan", "Database"],  
-        icons=["calendar-check-fill", "database"], 
+        options=["My Fitness Plan", "Coach Dashboard", "Database"],  
+        icons=["calendar-check-fill", "bar-chart-line", "database"], 
         menu_icon="heart-pulse",  
         default_index=0,
         styles={
@@ -26,23 +26,46 @@ with st.sidebar:
                 st.session_state.clear()
                 st.session_state.page = "auth"
                 st.rerun()
+    if tracing.PROFILING:
+        with st.expander("🩺\u00A0\u00A0Profiling"):
+            # Per session: only this browser tab's reruns are profiled.
+            st.radio("Profile each rerun", [None, "cprofile", "sample"], key="profile_mode",
+                     format_func=lambda mode: {None: "Off", "cprofile": "cProfile", "sample": "Sampling"}[mode])
+            st.caption("Startup")
+            st.json(startup.report(), expanded=False)
 
 if "page" not in st.session_state:
     st.session_state.page = "auth"  
 
-if selected == "My Fitness Plan":
-    if st.session_state.page == "auth":
-        authentication_page()
+def show_page(selected):
+    if selected == "My Fitness Plan":
+        if st.session_state.page == "auth":
+            startup.load_page("authentication", "authentication_page")()
 
-    elif st.session_state.page == "form_page":
-        submitted = form_page() 
-        if submitted: 
-            st.session_state.page = "fitness_page"
-            st.rerun()
+        elif st.session_state.page == "form_page":
+            submitted = startup.load_page("form_page", "form_page")()
+            if submitted: 
+                st.session_state.page = "fitness_page"
+                st.rerun()
+
+        elif st.session_state.page == "fitness_page":
+            startup.load_page("fitness_plan_page", "fitness_plan")()
+            startup.load_page("fitness_plan_page", "progress_tracking")()
+
+    elif selected == "Coach Dashboard":
+        startup.load_page("cohort_page", "cohort_dashboard")()
+
+    elif selected == "Database":
+        startup.load_page("database_page", "database")()
+
+with tracing.session_profiled(st.session_state, "rerun"):
+    show_page(selected)
 
-    elif st.session_state.page == "fitness_page":
-        fitness_plan()
-        progress_tracking()
+if tracing.PROFILING and st.session_state.get("profile_mode"):
+    # Fragment reruns (the progress section) are profiled on their own and
+    # show up here on the next full rerun.
+    for name, report in st.session_state.get("profile_reports", {}).items():
+        with st.expander(f"Last profiled {name} ({report['mode']}, {report['seconds'] * 1e3:.0f} ms)"):
+            st.code(report["report"], language=None)
 
-elif selected == "Database":
-    database()
\ No newline at end of file
+startup.first_paint()
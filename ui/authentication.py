@@ -1,9 +1,8 @@
 import streamlit as st
 import sqlite3
 import hashlib
-
-conn = sqlite3.connect('database/FitnessCoach.db', check_same_thread=False)
-cursor = conn.cursor()
+from db import fetch_one, transaction
+from tracing import traced
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -11,12 +10,10 @@ def hash_password(password):
 def signup_user(name, username, password):
     try:
         hashed_pw = hash_password(password)
-        cursor.execute("INSERT INTO User (Name, Username, Password) VALUES (?, ?, ?)", 
-                       (name, username, hashed_pw))
-        conn.commit()
-
-        cursor.execute("SELECT User_ID FROM User WHERE Username = ?", (username,))
-        user_id = cursor.fetchone()[0]
+        with transaction() as conn:
+            cursor = conn.execute("INSERT INTO User (Name, Username, Password) VALUES (?, ?, ?)", 
+                                  (name, username, hashed_pw))
+            user_id = cursor.lastrowid
 
         st.session_state.user_id = user_id
         st.session_state.name = name
@@ -27,9 +24,8 @@ def signup_user(name, username, password):
 
 def login_user(username, password):
     hashed_pw = hash_password(password)
-    cursor.execute("SELECT User_ID, Name FROM User WHERE Username = ? AND Password = ?", 
-                   (username, hashed_pw))
-    result = cursor.fetchone()
+    result = fetch_one("SELECT User_ID, Name FROM User WHERE Username = ? AND Password = ?", 
+                       (username, hashed_pw))
     if result:
         st.session_state.user_id = result[0]  
         st.session_state.name = result[1]
@@ -38,8 +34,7 @@ def login_user(username, password):
         return False 
 
 def has_plan(user_id):
-    cursor.execute("SELECT 1 FROM plan WHERE user_id = ?", (user_id,))
-    return (cursor.fetchone() is not None)
+    return (fetch_one("SELECT 1 FROM plan WHERE user_id = ?", (user_id,), user_id=user_id) is not None)
 
 def show_signup_form():
     st.title("Sign Up")
@@ -79,6 +74,7 @@ def show_login_form():
             else:
                 st.error("Incorrect username or password.")
 
+@traced("page.authentication")
 def authentication_page():
     st.markdown("<h1 style='text-align: center; color: #0764a3;'>🏃🏻‍♂️‍➡️ Fitness Coach Agent</h1>", unsafe_allow_html=True)
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -0,0 +1,64 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import cohort_analytics
+import db
+from planner import PLAN_UPSERT, USER_INFO_COLUMNS, USER_INFO_UPSERT, predict_batch, prepare_profiles
+
+def write_rows(pool, user_ids, gym, diet, info_rows):
+    with pool.transaction() as conn:
+        cohort_analytics.retract(conn, user_ids)
+        conn.executemany(PLAN_UPSERT, zip(user_ids, gym, diet))
+        conn.executemany(USER_INFO_UPSERT, info_rows)
+        cohort_analytics.contribute(conn, user_ids)
+
+def write_batch(frame, gym, diet):
+    # One transaction per shard, all shards written at once. The rows are
+    # split with the same user_id % shards rule as db.ShardRouter.
+    user_ids = frame["user_id"].to_numpy(dtype=np.int64)
+    info = frame[USER_INFO_COLUMNS].astype(object)
+    pools = db.user_pools()
+    shard = user_ids % len(pools)
+    parts = []
+    for i, pool in enumerate(pools):
+        rows = np.flatnonzero(shard == i)
+        if len(rows):
+            parts.append((pool, user_ids[rows].tolist(), gym[rows].tolist(), diet[rows].tolist(),
+                          list(info.iloc[rows].itertuples(index=False, name=None))))
+    db.fan_out(lambda part: write_rows(*part), parts)
+
+def run_batch(source, chunk_size=10000, dry_run=False, log=sys.stderr):
+    total = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(source, chunksize=chunk_size):
+        chunk_start = time.perf_counter()
+        frame = prepare_profiles(chunk)
+        gym, diet = predict_batch(frame)
+        if not dry_run:
+            write_batch(frame, gym, diet)
+        total += len(frame)
+        elapsed = time.perf_counter() - chunk_start
+        print(f"{total} rows ({len(frame) / elapsed:,.0f} rows/s this chunk)", file=log)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Done: {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=log)
+    return total, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate fitness plans for a CSV of user profiles.")
+    parser.add_argument("profiles", help="CSV with one row per user, using the User_info column names")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--shards", default=db.SHARDS_PATH, help="shard manifest (default: $FITNESS_SHARDS, else shards.json next to --db)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--dry-run", action="store_true", help="predict without writing to the database")
+    args = parser.parse_args()
+    db.configure(args.db, shards=args.shards)
+    run_batch(args.profiles, args.chunk_size, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+LATENCY_WINDOW = 4096
+
+# Coalesces concurrent single-item calls into one call of fn(items): the
+# worker takes the first waiting item, keeps collecting until it has
+# max_batch items or max_wait_ms has passed, and runs fn once for the whole
+# batch. fn must return one result per item, in order.
+class MicroBatcher:
+    def __init__(self, fn, max_batch=64, max_wait_ms=2.0, name="batcher"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._batches = 0
+        self._items = 0
+        self._sizes = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, item):
+        return self.submit_async(item).result()
+
+    def submit_async(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._call([item for item, _, _ in batch])
+            except Exception:
+                # One bad item must not fail its neighbours: retry one by one.
+                results = None
+            for index, (item, future, queued) in enumerate(batch):
+                try:
+                    future.set_result(results[index] if results is not None else self._call([item])[0])
+                except Exception as error:
+                    future.set_exception(error)
+            done = time.perf_counter()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._sizes[bucket(len(batch))] += 1
+                self._latencies.extend((done - queued) * 1000 for _, _, queued in batch)
+
+    def _call(self, items):
+        results = list(self.fn(items))
+        if len(results) != len(items):
+            raise ValueError(f"{self.name}: {len(results)} results for {len(items)} items")
+        return results
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sizes = dict(sorted(self._sizes.items()))
+            batches, items = self._batches, self._items
+        pick = lambda q: round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 3) if latencies else None
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else None,
+            "batch_size_histogram": sizes,
+            "latency_ms": {"p50": pick(0.50), "p99": pick(0.99)},
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+def bucket(size):
+    # Upper bound of the power-of-two bucket holding size: 1, 2, 4, 8, ...
+    return 1 << (size - 1).bit_length()
@@ -0,0 +1,585 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+import datasets
+from migrations import migrate
+
+DB_PATH = "database/FitnessCoach.db"
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+def time_calls(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return percentiles(samples)
+
+# -- db-lookup: per-user queries before and after the schema migrations ----
+
+LOOKUP_QUERIES = {
+    "has_plan": "SELECT 1 FROM plan WHERE user_id = ?",
+    "get_rec_from_db": "SELECT gym_rec, diet_rec FROM plan WHERE user_id = ?",
+    "progress_history": "SELECT previous_weight, new_weight, date FROM progress WHERE user_id = ? ORDER BY date",
+}
+
+def populate(conn, users, progress_per_user, iso_dates, seed=0):
+    rng = random.Random(seed)
+    start_day = date(2024, 1, 1)
+    fmt = "%Y-%m-%d" if iso_dates else "%d-%m-%Y"
+    chunk = 50000
+    for first in range(1, users + 1, chunk):
+        ids = range(first, min(first + chunk, users + 1))
+        with conn:
+            conn.executemany(
+                "INSERT INTO User_info (user_id, Age, Gender, Weight, height, \"Fitness Goal\") VALUES (?, ?, ?, ?, ?, ?)",
+                ((u, rng.randint(20, 70), rng.choice(("Male", "Female")), rng.randint(45, 120),
+                  rng.randint(150, 195), rng.choice(("Weight Loss", "Weight Gain"))) for u in ids),
+            )
+            conn.executemany(
+                "INSERT INTO plan (user_id, gym_rec, diet_rec) VALUES (?, ?, ?)",
+                ((u, rng.randrange(53), rng.randrange(3)) for u in ids),
+            )
+            conn.executemany(
+                "INSERT INTO progress (user_id, previous_weight, new_weight, date) VALUES (?, ?, ?, ?)",
+                ((u, 80.0, 79.0, (start_day + timedelta(days=rng.randrange(600))).strftime(fmt))
+                 for u in ids for _ in range(progress_per_user)),
+            )
+
+def copy_database(source, path):
+    # The backup API, not a file copy: in WAL mode recent commits may still
+    # be in the -wal file, which copying the main file would drop.
+    src, dst = sqlite3.connect(source), sqlite3.connect(path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+def build_lookup_db(path, users, progress_per_user, migrated):
+    copy_database(DB_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for table in ("User_info", "plan", "progress"):
+        conn.execute(f"DELETE FROM {table}")
+    if migrated:
+        migrate(conn)
+    conn.isolation_level = ""
+    populate(conn, users, progress_per_user, iso_dates=migrated)
+    conn.execute("ANALYZE")
+    return conn
+
+def bench_db_lookup(users, progress_per_user, samples, baseline_samples, keep_dir=None):
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-bench-")
+    results = {"users": users, "progress_per_user": progress_per_user}
+    try:
+        for label, migrated, n in (("baseline", False, baseline_samples), ("migrated", True, samples)):
+            if n <= 0:
+                continue
+            start = time.perf_counter()
+            conn = build_lookup_db(os.path.join(workdir, f"{label}.db"), users, progress_per_user, migrated)
+            build_seconds = time.perf_counter() - start
+            rng = random.Random(1)
+            user_ids = [(rng.randint(1, users),) for _ in range(n)]
+            results[label] = {
+                "build_seconds": round(build_seconds, 2),
+                "query_plans": {
+                    name: [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (1,))]
+                    for name, sql in LOOKUP_QUERIES.items()
+                },
+                "latency_us": {
+                    name: time_calls(lambda uid, sql=sql: conn.execute(sql, (uid,)).fetchall(), user_ids)
+                    for name, sql in LOOKUP_QUERIES.items()
+                },
+            }
+            conn.close()
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+# -- datasets: pandas parsing against the columnar cache ---------------------
+
+DATASET_SOURCES = [
+    ("data/gym recommendation.xlsx", 0),
+    ("data/diet_recommendations_dataset.csv", 0),
+    ("data/cleaned_gym_data.csv", None),
+    ("data/cleaned_diet_data.csv", None),
+]
+
+def bench_datasets(repeats, keep_dir=None):
+    import pandas as pd
+
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-bench-")
+    cache_dir, datasets.CACHE_DIR = datasets.CACHE_DIR, workdir
+    results = {}
+    try:
+        for path, index_col in DATASET_SOURCES:
+            runs = [(index_col,)] * repeats
+            reference = datasets._read_source(path, index_col)
+            start = time.perf_counter()
+            datasets.build(path, index_col)
+            build_ms = (time.perf_counter() - start) * 1e3
+            parse = time_calls(lambda i, path=path: datasets._read_source(path, i), runs)
+            load = time_calls(lambda i, path=path: datasets.load(path, i), runs)
+            columns = time_calls(lambda i, path=path: datasets.load_columns(path, i), runs)
+            try:
+                pd.testing.assert_frame_equal(reference, datasets.load(path, index_col), check_exact=True)
+                identical = True
+            except AssertionError:
+                identical = False
+            results[path] = {
+                "rows": len(reference),
+                "columns": reference.shape[1],
+                "identical": identical,
+                "build_ms": round(build_ms, 2),
+                "parse_us": parse,
+                "load_us": load,
+                "load_columns_us": columns,
+                "speedup_p50": round(parse["p50"] / load["p50"], 1),
+            }
+    finally:
+        datasets.CACHE_DIR = cache_dir
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+# -- inference: encode / predict / decode / persist for one plan and batches -
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+PROFILE_SEED = 7
+
+def synthetic_profiles(n, seed=PROFILE_SEED):
+    # Diet rows supply the body and health fields, gym rows the goal and
+    # training type; labels are decoded back to what the form submits.
+    import pandas as pd
+    from feature_encoder import form_label
+    from model_registry import get_model
+
+    diet = datasets.load("data/cleaned_diet_data.csv")
+    gym = datasets.load("data/cleaned_gym_data.csv")
+    diet_encoders, gym_encoders = get_model("diet_encoders"), get_model("gym_encoders")
+    rng = random.Random(seed)
+    diet_rows = diet.iloc[[rng.randrange(len(diet)) for _ in range(n)]].reset_index(drop=True)
+    gym_rows = gym.iloc[[rng.randrange(len(gym)) for _ in range(n)]].reset_index(drop=True)
+
+    def labels(frame, encoders, column):
+        return [form_label(v) for v in encoders[column].inverse_transform(frame[column].to_numpy())]
+
+    return pd.DataFrame({
+        "user_id": range(10_000_000, 10_000_000 + n),
+        "Age": diet_rows["Age"],
+        "Gender": labels(diet_rows, diet_encoders, "Gender"),
+        "Weight": diet_rows["Weight_kg"],
+        "height": diet_rows["Height_cm"],
+        "Fitness Goal": labels(gym_rows, gym_encoders, "Fitness Goal"),
+        "Fitness Type": labels(gym_rows, gym_encoders, "Fitness Type"),
+        "Disease_Type": labels(diet_rows, diet_encoders, "Disease_Type"),
+        "Severity": labels(diet_rows, diet_encoders, "Severity"),
+        "Physical_Activity_Level": labels(diet_rows, diet_encoders, "Physical_Activity_Level"),
+        "Daily_Caloric_Intake": diet_rows["Daily_Caloric_Intake"],
+        "Cholesterol": diet_rows["Cholesterol_mg/dL"],
+        "Blood_Pressure": diet_rows["Blood_Pressure_mmHg"],
+        "Glucose": diet_rows["Glucose_mg/dL"],
+        "Dietary_Restrictions": labels(diet_rows, diet_encoders, "Dietary_Restrictions"),
+        "Allergies": labels(diet_rows, diet_encoders, "Allergies"),
+        "Preferred_Cuisine": labels(diet_rows, diet_encoders, "Preferred_Cuisine"),
+        "Weekly_Exercise_Hours": diet_rows["Weekly_Exercise_Hours"],
+        "Adherence_to_Diet_Plan": diet_rows["Adherence_to_Diet_Plan"],
+        "Dietary_Nutrient_Imbalance_Score": diet_rows["Dietary_Nutrient_Imbalance_Score"],
+    })
+
+def _stage_timer(samples):
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        samples.setdefault(stage, []).append((time.perf_counter() - start) * 1e6)
+        return result
+    return timed
+
+def bench_single(profiles):
+    # One form submission at a time, split the way form_page runs it.
+    import db
+    import planner
+    from feature_encoder import get_encoder
+    from plan_decoder import diet_label, gym_plan
+
+    gym_encoder, diet_encoder = get_encoder("gym"), get_encoder("diet")
+    samples = {}
+    timed = _stage_timer(samples)
+    for record in profiles.drop(columns="user_id").to_dict("records"):
+        start = time.perf_counter()
+        profile = timed("complete_profile", planner.complete_profile, record)
+        gym_features = timed("encode_gym", lambda: gym_encoder.frame(gym_encoder.encode_record(profile)))
+        diet_features = timed("encode_diet", lambda: diet_encoder.frame(diet_encoder.encode_record(profile)))
+        gym_rec = int(timed("gym_predict", planner.gym_predict, gym_features)[0])
+        diet_rec = int(timed("diet_predict", planner.diet_predict, diet_features)[0])
+        timed("decode", lambda: (gym_plan(gym_rec), diet_label(diet_rec)))
+        user_id = 10_000_000 + len(samples["decode"])
+
+        def persist():
+            with db.transaction() as conn:
+                planner.save_plan(conn, user_id, record, gym_rec, diet_rec)
+        timed("persist", persist)
+        samples.setdefault("total", []).append((time.perf_counter() - start) * 1e6)
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+def run_batch_stages(frame, timed):
+    import planner
+    from batch_predict import write_batch
+    from feature_encoder import get_encoder
+    from plan_decoder import diet_label, gym_plan
+
+    gym_encoder, diet_encoder = get_encoder("gym"), get_encoder("diet")
+    prepared = timed("prepare", planner.prepare_profiles, frame)
+    gym_features = timed("encode_gym", lambda: gym_encoder.frame(gym_encoder.encode_columns(prepared)))
+    diet_features = timed("encode_diet", lambda: diet_encoder.frame(diet_encoder.encode_columns(prepared)))
+    gym = timed("gym_predict", lambda: np.asarray(planner.gym_predict(gym_features), dtype=np.int64))
+    diet = timed("diet_predict", lambda: np.asarray(planner.diet_predict(diet_features), dtype=np.int64))
+    timed("decode", lambda: ([gym_plan(g) for g in gym.tolist()], [diet_label(d) for d in diet.tolist()]))
+    timed("persist", write_batch, prepared, gym, diet)
+
+def bench_batches(profiles, batch_sizes, target_rows):
+    results = {}
+    for size in batch_sizes:
+        frame = profiles.iloc[:size]
+        repeats = max(1, min(20, target_rows // size))
+        samples = {}
+        timed = _stage_timer(samples)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run_batch_stages(frame, timed)
+            samples.setdefault("total", []).append((time.perf_counter() - start) * 1e6)
+
+        # A separate traced pass: tracemalloc slows everything it watches.
+        tracemalloc.start()
+        run_batch_stages(frame, lambda stage, fn, *args: fn(*args))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[str(size)] = {
+            "repeats": repeats,
+            "latency_us": {stage: percentiles(values) for stage, values in samples.items()},
+            "rows_per_second": {
+                stage: round(size / (statistics.median(values) / 1e6), 1) for stage, values in samples.items()
+            },
+            "peak_traced_bytes": peak,
+        }
+    return results
+
+def _run_metadata():
+    import numpy
+    import pandas
+    import sklearn
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "git_commit": git("rev-parse", "HEAD"),
+        "git_dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+def bench_inference(samples, batch_sizes, target_rows, keep_dir=None):
+    import db
+    import planner
+    from model_registry import _rss_bytes, registry_stats
+
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-bench-")
+    try:
+        # Writes go to a copy; the real database is never touched.
+        path = os.path.join(workdir, "inference.db")
+        copy_database(DB_PATH, path)
+        db.configure(path)
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        planner.warm_up()
+        warm_up_seconds = time.perf_counter() - start
+
+        profiles = synthetic_profiles(max(samples, max(batch_sizes)))
+        result = {
+            "meta": _run_metadata(),
+            "params": {"samples": samples, "batch_sizes": batch_sizes, "target_rows": target_rows},
+            "warm_up_seconds": round(warm_up_seconds, 3),
+            "single": bench_single(profiles.iloc[:samples]),
+            "batches": bench_batches(profiles, batch_sizes, target_rows),
+            "rss_growth_bytes": max(_rss_bytes() - rss_before, 0),
+            "models": {name: {"loaded": s["loaded"], "load_seconds": s["load_seconds"],
+                              "memory_bytes": s["memory_bytes"]}
+                       for name, s in registry_stats().items()},
+        }
+        db.pool.close()
+        return result
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# -- cohorts: coach dashboard from rollups against a raw scan ---------------
+
+def bench_cohorts(users, progress_per_user, updates, keep_dir=None):
+    import cohort_analytics
+    import db
+    import progress_store
+
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-bench-")
+    try:
+        path = os.path.join(workdir, "cohorts.db")
+        start = time.perf_counter()
+        conn = build_lookup_db(path, users, progress_per_user, migrated=False)
+        # populate() leaves these empty; spread members over levels and adherence.
+        with conn:
+            conn.execute(
+                "UPDATE User_info SET level = CASE user_id % 4 WHEN 0 THEN 'Underweight' WHEN 1 THEN 'Normal' "
+                "WHEN 2 THEN 'Overweight' ELSE 'Obese' END, Adherence_to_Diet_Plan = (user_id * 37) % 100"
+            )
+        build_seconds = time.perf_counter() - start
+        conn.isolation_level = None
+        start = time.perf_counter()
+        migrate(conn)
+        migrate_seconds = time.perf_counter() - start
+        conn.close()
+
+        db.configure(path)
+        cohort_analytics.dashboard()  # loads the decode tables
+        dashboard = [cohort_analytics.dashboard()["seconds"] * 1e6 for _ in range(20)]
+        start = time.perf_counter()
+        mismatches = cohort_analytics.verify()
+        scan_seconds = time.perf_counter() - start
+
+        rng = random.Random(2)
+        day = date(2026, 1, 1)
+
+        def update(user_id, rollups):
+            with db.transaction() as conn:
+                if rollups:
+                    progress_store.apply_entry(conn, user_id, 80.0, 78.5, day)
+                else:
+                    conn.execute("INSERT INTO progress (user_id, previous_weight, new_weight, date) VALUES (?, ?, ?, ?)",
+                                 (user_id, 80.0, 78.5, day.isoformat()))
+
+        user_ids = [rng.randint(1, users) for _ in range(updates)]
+        result = {
+            "users": users,
+            "progress_per_user": progress_per_user,
+            "build_seconds": round(build_seconds, 2),
+            "migrate_seconds": round(migrate_seconds, 2),
+            "rollup_rows": {table: db.fetch_one(f"SELECT COUNT(*) FROM {table}")[0]
+                            for table in cohort_analytics.ROLLUP_TABLES.values()},
+            "dashboard_us": percentiles(dashboard),
+            "raw_scan_seconds": round(scan_seconds, 2),
+            "verify": mismatches,
+            "progress_insert_us": time_calls(lambda uid: update(uid, False), [(u,) for u in user_ids]),
+            "apply_entry_us": time_calls(lambda uid: update(uid, True), [(u,) for u in user_ids]),
+        }
+        db.pool.close()
+        return result
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# -- shards: concurrent weight updates, one file against N, and an online split
+
+def _write_load(writers, seconds, users, seed, stop=None):
+    import progress_store
+
+    day = date(2026, 1, 1)
+    samples, errors = [], Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(number):
+        rng = random.Random(seed * 1000 + number)
+        mine, failed = [], Counter()
+        while not (stop.is_set() if stop is not None else time.perf_counter() >= deadline):
+            start = time.perf_counter()
+            try:
+                progress_store.record_weight(rng.randint(1, users), 80.0, 79.5, day)
+            except sqlite3.Error as error:
+                failed[str(error)] += 1
+                continue
+            mine.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            samples.extend(mine)
+            errors.update(failed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    return threads, samples, errors, start
+
+def _finish_load(threads, samples, errors, start):
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return {"writes": len(samples), "writes_per_second": round(len(samples) / wall, 1),
+            "latency_us": percentiles(samples) if samples else None, "errors": dict(errors)}
+
+def bench_shards(users, shards, writers, seconds, keep_dir=None):
+    import cohort_analytics
+    import db
+    import shards as shard_tool
+
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-bench-")
+    try:
+        path = os.path.join(workdir, "directory.db")
+        manifest = os.path.join(workdir, "shards.json")
+        conn = build_lookup_db(path, users, 3, migrated=False)
+        conn.isolation_level = None
+        migrate(conn)  # backfills the summaries and rollups of the populated rows
+        conn.close()
+        # Routed through the manifest from the start, as a deployment
+        # would be: one file until the split writes it.
+        db.configure(path, shards=manifest)
+        result = {"users": users, "shards": shards, "writers": writers,
+                  "one_file": _finish_load(*_write_load(writers, seconds, users, 1))}
+        rows_before = sum(db.on_shards(lambda conn: conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0]))
+
+        stop = threading.Event()
+        load = _write_load(writers, 0, users, 2, stop)
+        start = time.perf_counter()
+        split = shard_tool.split(path, shards, manifest, log=io.StringIO())
+        split["seconds"] = round(time.perf_counter() - start, 2)
+        time.sleep(1.0)  # some writes after the cutover too
+        stop.set()
+        during = _finish_load(*load)
+        rows_after = sum(db.on_shards(lambda conn: conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0]))
+        result["online_split"] = {
+            **split,
+            "writes_during": during,
+            "lost_writes": rows_before + during["writes"] - rows_after,
+            "cohort_verify": cohort_analytics.verify(),
+        }
+        result["sharded"] = _finish_load(*_write_load(writers, seconds, users, 3))
+        db.close()
+        return result
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def compare_results(old, new, threshold):
+    # Every p50 present in both runs, with the new/old ratio; ratios above
+    # the threshold are flagged as regressions.
+    rows = []
+
+    def walk(a, b, path):
+        if isinstance(a, dict) and isinstance(b, dict):
+            if "p50" in a and "p50" in b:
+                ratio = b["p50"] / a["p50"] if a["p50"] else None
+                rows.append({"metric": path, "old_p50": a["p50"], "new_p50": b["p50"],
+                             "ratio": None if ratio is None else round(ratio, 3),
+                             "regression": ratio is not None and ratio > threshold})
+                return
+            for key in a.keys() & b.keys():
+                walk(a[key], b[key], f"{path}.{key}" if path else key)
+
+    walk(old, new, "")
+    rows.sort(key=lambda r: r["metric"])
+    return {
+        "old_commit": old.get("meta", {}).get("git_commit"),
+        "new_commit": new.get("meta", {}).get("git_commit"),
+        "threshold": threshold,
+        "regressions": [r for r in rows if r["regression"]],
+        "metrics": rows,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fitness Coach Agent benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    lookup = sub.add_parser("db-lookup", help="per-user plan/progress lookups at scale")
+    lookup.add_argument("--users", type=int, default=1_000_000)
+    lookup.add_argument("--progress-per-user", type=int, default=3)
+    lookup.add_argument("--samples", type=int, default=5000)
+    lookup.add_argument("--baseline-samples", type=int, default=20,
+                        help="lookups against the unmigrated schema (full scans; keep small, 0 to skip)")
+    lookup.add_argument("--keep-dir", help="build the databases here and leave them in place")
+
+    data = sub.add_parser("datasets", help="pd.read_csv/read_excel against the columnar dataset cache")
+    data.add_argument("--repeats", type=int, default=5)
+    data.add_argument("--keep-dir", help="build the caches here and leave them in place")
+
+    inference = sub.add_parser("inference", help="per-stage plan generation latency, batch throughput and memory")
+    inference.add_argument("--samples", type=int, default=300, help="single-profile plans to time")
+    inference.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    inference.add_argument("--target-rows", type=int, default=20000, help="rows to push through each batch size")
+    inference.add_argument("--output", help="write the JSON here as well as printing it")
+    inference.add_argument("--keep-dir", help="keep the scratch database here")
+
+    cohorts = sub.add_parser("cohorts", help="coach dashboard from the cohort rollups against a raw scan")
+    cohorts.add_argument("--users", type=int, default=1_000_000)
+    cohorts.add_argument("--progress-per-user", type=int, default=3)
+    cohorts.add_argument("--updates", type=int, default=2000, help="weight updates to time with and without the rollups")
+    cohorts.add_argument("--keep-dir", help="build the database here and leave it in place")
+
+    sharding = sub.add_parser("shards", help="concurrent weight updates on one file against N shards, and an online split")
+    sharding.add_argument("--users", type=int, default=200_000)
+    sharding.add_argument("--shards", type=int, default=4)
+    sharding.add_argument("--writers", type=int, default=8, help="threads recording weight updates")
+    sharding.add_argument("--seconds", type=float, default=10.0, help="length of each write-load run")
+    sharding.add_argument("--keep-dir", help="build the databases here and leave them in place")
+
+    compare = sub.add_parser("compare", help="p50 ratios between two saved benchmark results")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=1.2)
+
+    args = parser.parse_args()
+    if args.command == "db-lookup":
+        result = bench_db_lookup(args.users, args.progress_per_user, args.samples, args.baseline_samples, args.keep_dir)
+    elif args.command == "datasets":
+        result = bench_datasets(args.repeats, args.keep_dir)
+    elif args.command == "inference":
+        result = bench_inference(args.samples, args.batch_sizes, args.target_rows, args.keep_dir)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+    elif args.command == "shards":
+        result = bench_shards(args.users, args.shards, args.writers, args.seconds, args.keep_dir)
+    elif args.command == "cohorts":
+        result = bench_cohorts(args.users, args.progress_per_user, args.updates, args.keep_dir)
+    else:
+        with open(args.old) as f_old, open(args.new) as f_new:
+            result = compare_results(json.load(f_old), json.load(f_new), args.threshold)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from tracing import traced
+
+# png/svg render with matplotlib once per timeline version; native sends only
+# the points and lets the browser draw them.
+CHART_BACKEND = os.environ.get("FITNESS_CHART_BACKEND", "png")
+CACHE_SIZE = 256
+PADDING = 2
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def _cached(key, render):
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = render()
+    with _lock:
+        _cache[key] = value
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+@traced("chart.render")
+def render_weight_chart(timeline_df, fmt):
+    # A bare Figure is never registered with pyplot, so nothing accumulates
+    # in its global figure list between reruns.
+    from matplotlib.figure import Figure
+    import matplotlib.dates as mdates
+
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+
+        ax.plot(timeline_df["Date"], timeline_df["Weight"], marker='o', linestyle='-')
+
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Weight (kg)")
+        ax.set_title("Weight Progress")
+        ax.grid(True)
+
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+
+        fig.autofmt_xdate(rotation=30)
+
+        min_w = timeline_df["Weight"].min()
+        max_w = timeline_df["Weight"].max()
+        ax.set_ylim(min_w - PADDING, max_w + PADDING)
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt)
+    finally:
+        fig.clear()
+    data = buffer.getvalue()
+    return data.decode("utf-8") if fmt == "svg" else data
+
+def vega_spec(timeline_df):
+    return {
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": "Date", "type": "temporal", "title": "Date", "axis": {"format": "%d/%m/%Y"}},
+            "y": {
+                "field": "Weight", "type": "quantitative", "title": "Weight (kg)",
+                "scale": {"domain": [float(timeline_df["Weight"].min()) - PADDING, float(timeline_df["Weight"].max()) + PADDING]},
+            },
+        },
+        "title": "Weight Progress",
+    }
+
+def show_weight_chart(timeline, key, backend=None):
+    backend = backend or CHART_BACKEND
+    timeline_df = pd.DataFrame(timeline, columns=["Date", "Weight"])
+    timeline_df["Date"] = pd.to_datetime(timeline_df["Date"])
+
+    if backend == "native":
+        st.vega_lite_chart(timeline_df, vega_spec(timeline_df), use_container_width=True)
+    else:
+        image = _cached((key, backend), lambda: render_weight_chart(timeline_df, backend))
+        st.image(image, use_container_width=True)
+
+def cache_stats():
+    with _lock:
+        return {"entries": len(_cache), "capacity": CACHE_SIZE}
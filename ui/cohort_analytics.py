@@ -0,0 +1,234 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import db
+
+# Cohort views for coaches: weight-change distributions by fitness goal,
+# adherence against outcome, and the most common plans per BMI level.
+#
+# The dashboard reads two small rollup tables (migration cohort_rollups)
+# whose size depends on the number of cohorts, not users. They are updated
+# in the same transaction as the rows they summarise: a user's old
+# contribution is retracted, the row is written, and the new contribution
+# added, all as set-based SQL. rebuild() recomputes them from scratch and
+# scan() derives the same figures straight from User_info/plan/progress
+# with pandas, for verification.
+
+MAX_CHANGE_KG = 30
+GOALS = ["Weight Loss", "Weight Gain"]
+LEVELS = ["Underweight", "Normal", "Overweight", "Obese"]
+TOP_PLANS = 5
+
+OUTCOME = "outcome"
+PLANS = "plans"
+ROLLUPS = (OUTCOME, PLANS)
+
+# Kept in step with migrations.cohort_rollups.
+ROLLUP_SQL = {
+    OUTCOME: f"""
+        INSERT INTO cohort_outcome (fitness_goal, level, adherence_bin, change_bin, users, change_sum)
+        SELECT COALESCE(i."Fitness Goal", 'Unknown'), COALESCE(i.level, 'Unknown'),
+            COALESCE(CAST(MIN(MAX(i.Adherence_to_Diet_Plan, 0), 99.999) / 10 AS INTEGER), -1),
+            MAX(MIN(CAST(ROUND(s.last_weight - s.start_weight) AS INTEGER), {MAX_CHANGE_KG}), -{MAX_CHANGE_KG}),
+            :sign * COUNT(*), :sign * SUM(s.last_weight - s.start_weight)
+        FROM progress_summary s LEFT JOIN User_info i ON i.user_id = s.user_id
+        WHERE s.user_id {{users}}
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (fitness_goal, level, adherence_bin, change_bin) DO UPDATE SET
+            users = users + excluded.users,
+            change_sum = change_sum + excluded.change_sum
+    """,
+    PLANS: """
+        INSERT INTO cohort_plans (level, gym_rec, diet_rec, users)
+        SELECT COALESCE(i.level, 'Unknown'), COALESCE(p.gym_rec, -1), COALESCE(p.diet_rec, -1), :sign * COUNT(*)
+        FROM plan p LEFT JOIN User_info i ON i.user_id = p.user_id
+        WHERE p.user_id {users}
+        GROUP BY 1, 2, 3
+        ON CONFLICT (level, gym_rec, diet_rec) DO UPDATE SET users = users + excluded.users
+    """,
+}
+ROLLUP_TABLES = {OUTCOME: "cohort_outcome", PLANS: "cohort_plans"}
+ROLLUP_KEYS = {OUTCOME: ["fitness_goal", "level", "adherence_bin", "change_bin"], PLANS: ["level", "gym_rec", "diet_rec"]}
+
+def _users_clause(conn, user_ids):
+    if len(user_ids) == 1:
+        return "= :user_id", {"user_id": int(user_ids[0])}
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS cohort_users (user_id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.cohort_users")
+    conn.executemany("INSERT OR IGNORE INTO temp.cohort_users VALUES (?)", ((int(u),) for u in user_ids))
+    return "IN (SELECT user_id FROM temp.cohort_users)", {}
+
+def _apply(conn, user_ids, rollups, sign):
+    if len(user_ids) == 0:
+        return
+    clause, params = _users_clause(conn, user_ids)
+    for rollup in rollups:
+        conn.execute(ROLLUP_SQL[rollup].format(users=clause), {"sign": sign, **params})
+
+def retract(conn, user_ids, rollups=ROLLUPS):
+    # Take these users' current rows out of the rollups; call before changing them.
+    _apply(conn, user_ids, rollups, -1)
+
+def contribute(conn, user_ids, rollups=ROLLUPS):
+    # Count these users' current rows into the rollups; call after changing them.
+    _apply(conn, user_ids, rollups, 1)
+
+def rebuild(conn):
+    for rollup in ROLLUPS:
+        conn.execute(f"DELETE FROM {ROLLUP_TABLES[rollup]}")
+        conn.execute(ROLLUP_SQL[rollup].format(users="IS NOT NULL"), {"sign": 1})
+
+# -- dashboard reads ---------------------------------------------------------
+
+def _read(sql):
+    # All shards at once; a user's rows are all in one shard. Empty results
+    # come back untyped, so they are left out unless every shard is empty.
+    frames = db.on_shards(lambda conn: pd.read_sql_query(sql, conn))
+    return pd.concat([f for f in frames if len(f)] or frames[:1], ignore_index=True)
+
+def _rollup(rollup):
+    # Each shard keeps the rollup of its own users, so cohorts are summed.
+    frame = _read(f"SELECT * FROM {ROLLUP_TABLES[rollup]} WHERE users > 0")
+    keys = ROLLUP_KEYS[rollup]
+    return frame.groupby(keys, as_index=False)[[c for c in frame.columns if c not in keys]].sum()
+
+def outcome_rollup():
+    return _rollup(OUTCOME)
+
+def plan_rollup():
+    return _rollup(PLANS)
+
+def _histogram_quantiles(bins, counts, quantiles):
+    # Quantiles of a histogram whose bins are whole kilograms.
+    cumulative = np.cumsum(counts)
+    positions = np.searchsorted(cumulative, np.asarray(quantiles) * cumulative[-1], side="left")
+    return bins[np.minimum(positions, len(bins) - 1)]
+
+def change_distribution(outcome):
+    # Users per kilogram of change for each goal, plus per-goal summary stats.
+    histogram = (outcome.groupby(["change_bin", "fitness_goal"])["users"].sum()
+                 .unstack(fill_value=0).reindex(range(-MAX_CHANGE_KG, MAX_CHANGE_KG + 1), fill_value=0))
+    totals = outcome.groupby("fitness_goal")[["users", "change_sum"]].sum()
+    stats = pd.DataFrame({"users": totals["users"], "mean_change_kg": totals["change_sum"] / totals["users"]})
+    bins = histogram.index.to_numpy()
+    for goal in stats.index:
+        p10, p50, p90 = _histogram_quantiles(bins, histogram[goal].to_numpy(), [0.1, 0.5, 0.9])
+        stats.loc[goal, ["p10_kg", "median_kg", "p90_kg"]] = p10, p50, p90
+    return histogram, stats
+
+def adherence_outcome(outcome):
+    # Mean change and share moving towards the goal, per goal and adherence decile.
+    frame = outcome[outcome["adherence_bin"] >= 0]
+    toward = np.where(frame["fitness_goal"] == "Weight Gain", frame["change_bin"] > 0, frame["change_bin"] < 0)
+    frame = frame.assign(toward_users=frame["users"] * toward)
+    grouped = frame.groupby(["fitness_goal", "adherence_bin"])[["users", "change_sum", "toward_users"]].sum()
+    result = pd.DataFrame({
+        "users": grouped["users"],
+        "mean_change_kg": grouped["change_sum"] / grouped["users"],
+        "toward_goal": grouped["toward_users"] / grouped["users"],
+    }).reset_index()
+    result["adherence"] = (result["adherence_bin"] * 10).astype(str) + "-" + (result["adherence_bin"] * 10 + 10).astype(str) + "%"
+    return result
+
+def top_plans(plans, n=TOP_PLANS):
+    # The n most common (gym_rec, diet_rec) pairs per BMI level, with their share of the level.
+    from plan_decoder import decode_table
+
+    plans = plans.assign(share=plans["users"] / plans.groupby("level")["users"].transform("sum"))
+    top = (plans.sort_values(["level", "users"], ascending=[True, False])
+           .groupby("level", sort=False).head(n).reset_index(drop=True))
+    gym_table, diet_table = decode_table("gym_encoders"), decode_table("diet_encoders")
+    top["diet"] = [diet_table[d] if 0 <= d < len(diet_table) else "?" for d in top["diet_rec"]]
+    top["exercises"] = [gym_table[g].exercises if 0 <= g < len(gym_table) else "?" for g in top["gym_rec"]]
+    return top
+
+def dashboard():
+    start = time.perf_counter()
+    outcome, plans = outcome_rollup(), plan_rollup()
+    histogram, stats = change_distribution(outcome)
+    return {
+        "histogram": histogram,
+        "goal_stats": stats,
+        "adherence": adherence_outcome(outcome),
+        "top_plans": top_plans(plans),
+        "seconds": time.perf_counter() - start,
+    }
+
+# -- from the raw tables ---------------------------------------------------
+
+def scan():
+    # The rollups' contents computed directly from User_info, plan and progress.
+    info = _read('SELECT user_id, "Fitness Goal" AS fitness_goal, level, Adherence_to_Diet_Plan AS adherence FROM User_info')
+    progress = _read("SELECT user_id, date, progress_id, previous_weight, new_weight FROM progress")
+    plan = _read("SELECT user_id, gym_rec, diet_rec FROM plan")
+
+    progress = progress.sort_values(["user_id", "date", "progress_id"], kind="stable")
+    by_user = progress.groupby("user_id", sort=False)
+    change = (by_user["new_weight"].last() - by_user["previous_weight"].first()).rename("change")
+    users = change.reset_index().merge(info, on="user_id", how="left")
+    users["fitness_goal"] = users["fitness_goal"].fillna("Unknown")
+    users["level"] = users["level"].fillna("Unknown")
+    adherence = users["adherence"].to_numpy(dtype=np.float64)
+    users["adherence_bin"] = np.where(np.isnan(adherence), -1,
+                                      (np.clip(np.nan_to_num(adherence), 0, 99.999) / 10).astype(np.int64))
+    # SQLite's ROUND rounds halves away from zero; np.round would not.
+    rounded = np.sign(users["change"]) * np.floor(np.abs(users["change"]) + 0.5)
+    users["change_bin"] = np.clip(rounded, -MAX_CHANGE_KG, MAX_CHANGE_KG).astype(np.int64)
+    outcome = (users.groupby(["fitness_goal", "level", "adherence_bin", "change_bin"])
+               .agg(users=("user_id", "size"), change_sum=("change", "sum")).reset_index())
+
+    plan = plan.merge(info[["user_id", "level"]], on="user_id", how="left")
+    plan["level"] = plan["level"].fillna("Unknown")
+    plans = (plan.fillna({"gym_rec": -1, "diet_rec": -1}).astype({"gym_rec": np.int64, "diet_rec": np.int64})
+             .groupby(["level", "gym_rec", "diet_rec"]).size().rename("users").reset_index())
+    return outcome, plans
+
+def verify():
+    start = time.perf_counter()
+    scanned = dict(zip(ROLLUPS, scan()))
+    scan_seconds = time.perf_counter() - start
+    stored = {OUTCOME: outcome_rollup(), PLANS: plan_rollup()}
+    result = {"scan_seconds": round(scan_seconds, 3)}
+    for rollup in ROLLUPS:
+        merged = stored[rollup].merge(scanned[rollup], on=ROLLUP_KEYS[rollup], how="outer", suffixes=("", "_scan")).fillna(0)
+        mismatched = merged["users"] != merged["users_scan"]
+        if rollup == OUTCOME:
+            mismatched |= ~np.isclose(merged["change_sum"], merged["change_sum_scan"], atol=1e-6)
+        result[rollup] = {"rows": len(merged), "mismatched_rows": int(mismatched.sum())}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Coach cohort rollups.")
+    parser.add_argument("command", choices=["report", "verify", "rebuild"])
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--shards", default=db.SHARDS_PATH, help="shard manifest (default: $FITNESS_SHARDS, else shards.json next to --db)")
+    args = parser.parse_args()
+
+    db.configure(args.db, shards=args.shards)
+    if args.command == "rebuild":
+        start = time.perf_counter()
+
+        def rebuild_shard(pool):
+            with pool.transaction() as conn:
+                rebuild(conn)
+
+        db.fan_out(rebuild_shard, db.user_pools())
+        result = {"rebuilt": [ROLLUP_TABLES[r] for r in ROLLUPS], "seconds": round(time.perf_counter() - start, 3)}
+    elif args.command == "verify":
+        result = verify()
+    else:
+        view = dashboard()
+        result = {
+            "seconds": round(view["seconds"], 4),
+            "goal_stats": json.loads(view["goal_stats"].to_json(orient="index")),
+            "adherence": json.loads(view["adherence"].to_json(orient="records")),
+            "top_plans": json.loads(view["top_plans"].drop(columns="exercises").to_json(orient="records")),
+        }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
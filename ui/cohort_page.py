@@ -0,0 +1,53 @@
+import streamlit as st
+import cohort_analytics
+from tracing import traced
+
+# The rollups are small and always current, so a short TTL is enough to
+# spare reruns without showing stale cohorts for long.
+@st.cache_data(ttl=30)
+def load_dashboard():
+    return cohort_analytics.dashboard()
+
+@traced("page.cohorts")
+def cohort_dashboard():
+    st.title("📈 Coach Dashboard")
+
+    view = load_dashboard()
+    stats = view["goal_stats"]
+    if stats.empty:
+        st.info("No weight updates recorded yet.")
+        return
+
+    st.subheader("Weight change by goal")
+    columns = st.columns(len(stats))
+    for column, (goal, row) in zip(columns, stats.iterrows()):
+        with column:
+            st.metric(f"{goal} · {int(row['users'])} members", f"{row['mean_change_kg']:+.1f} kg",
+                      help=f"Median {row['median_kg']:+.0f} kg, 10th-90th percentile "
+                           f"{row['p10_kg']:+.0f} to {row['p90_kg']:+.0f} kg")
+    histogram = view["histogram"]
+    st.bar_chart(histogram[(histogram.sum(axis=1) > 0)].rename_axis("change (kg)"), stack=False)
+    st.caption("Members per kilogram of change since their first weigh-in, clamped to ±30 kg.")
+
+    st.subheader("Diet adherence against outcome")
+    adherence = view["adherence"]
+    goal = st.selectbox("Goal", list(adherence["fitness_goal"].unique()))
+    chosen = adherence[adherence["fitness_goal"] == goal].set_index("adherence")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("Mean change (kg)")
+        st.line_chart(chosen["mean_change_kg"])
+    with col2:
+        st.caption("Share moving towards their goal")
+        st.line_chart(chosen["toward_goal"])
+
+    st.subheader("Most assigned plans by BMI level")
+    top = view["top_plans"]
+    order = {level: i for i, level in enumerate(cohort_analytics.LEVELS)}
+    for level in sorted(top["level"].unique(), key=lambda level: order.get(level, len(order))):
+        with st.expander(level):
+            st.dataframe(
+                top[top["level"] == level][["users", "share", "diet", "exercises"]].reset_index(drop=True),
+                column_config={"share": st.column_config.ProgressColumn("share", min_value=0.0, max_value=1.0)},
+            )
+    st.caption(f"Computed in {view['seconds'] * 1000:.0f} ms from the cohort rollups.")
@@ -1,19 +1,194 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+from db import USER_TABLES, fan_out, fetch_all, fetch_one, pool_for, user_pools
+from tracing import traced
 
-def database(): 
-    conn = sqlite3.connect("database/FitnessCoach.db", check_same_thread=False)
+TABLES = ["plan", "User", "User_info", "progress"]
+# Never sent to the browser.
+HIDDEN_COLUMNS = {"User": {"Password"}}
+PAGE_SIZES = [25, 50, 100, 250]
+ROW_ORDER = "(row order)"
+NO_FILTER = "(none)"
+FILTER_OPERATORS = {
+    "=": "{col} = ?",
+    "contains": "CAST({col} AS TEXT) LIKE ?",
+    ">=": "{col} >= ?",
+    "<=": "{col} <= ?",
+}
 
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+@st.cache_data(ttl=300)
+def table_columns(table):
+    rows = fetch_all(f"PRAGMA table_info({quote(table)})")
+    hidden = HIDDEN_COLUMNS.get(table, set())
+    return [row[1] for row in rows if row[1] not in hidden]
+
+@st.cache_data(ttl=300)
+def sortable_columns(table):
+    # Columns an index can order by: the rowid alias and the first column of
+    # each index (migrations.SORT_INDEXES adds the rest). Anything else
+    # would sort the whole table on every page.
+    columns = fetch_all(f"PRAGMA table_info({quote(table)})")
+    keys = [(name, kind) for _, name, kind, _, _, pk in columns if pk]
+    sortable = {keys[0][0]} if len(keys) == 1 and keys[0][1].upper() == "INTEGER" else set()
+    for _, index, *_ in fetch_all(f"PRAGMA index_list({quote(table)})"):
+        first = fetch_one(f"PRAGMA index_info({quote(index)})")
+        if first is not None and first[2] is not None:
+            sortable.add(first[2])
+    return [column for column in table_columns(table) if column in sortable]
+
+def where_clause(table_filter):
+    if table_filter is None:
+        return "", []
+    column, operator, value = table_filter
+    if operator == "contains":
+        value = f"%{value}%"
+    return " WHERE " + FILTER_OPERATORS[operator].format(col=quote(column)), [value]
+
+def table_pools(table):
+    # Accounts stay in the directory database; per-user tables are sharded.
+    return user_pools() if table in USER_TABLES else [pool_for()]
+
+@st.cache_data(ttl=30)
+def row_count(table, table_filter):
+    where, params = where_clause(table_filter)
+    sql = f"SELECT COUNT(*) FROM {quote(table)}{where}"
+    return sum(fan_out(lambda target: target_count(target, sql, params), table_pools(table)))
+
+def target_count(target, sql, params):
+    with target.connection() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+def page_query(table, columns, sort_column, descending, table_filter, after, limit, shard=0):
+    # Keyset pagination on (sort key, shard, rowid): every page is a few
+    # index/rowid seeks plus LIMIT per shard, however deep into the table it
+    # is. The sort key is the bare column so its index serves the ORDER BY;
+    # NULLs sort first ascending and last descending, as SQLite sorts them.
+    direction = "DESC" if descending else "ASC"
+    sort_key = "rowid" if sort_column is None else quote(sort_column)
+    where, params = where_clause(table_filter)
+    projection = ", ".join(quote(c) for c in columns)
+    parts, values = [], []
+    for condition, range_params in key_ranges(sort_key, sort_column is not None, descending, after, shard):
+        if condition:
+            condition = (" AND " if where else " WHERE ") + condition
+        parts.append(f"SELECT {projection}, {sort_key} AS _sort_key, {int(shard)} AS _shard, rowid AS _row"
+                     f" FROM {quote(table)}{where}{condition}"
+                     f" ORDER BY _sort_key {direction}, _row {direction} LIMIT ?")
+        values += params + range_params + [limit]
+    if not parts:
+        return f"SELECT {projection}, NULL AS _sort_key, 0 AS _shard, NULL AS _row FROM {quote(table)} WHERE 0", []
+    if len(parts) == 1:
+        return parts[0], values
+    # Each part is at most limit rows; only their merge is sorted.
+    union = " UNION ALL ".join(f"SELECT * FROM ({part})" for part in parts)
+    return f"SELECT * FROM ({union}) ORDER BY _sort_key {direction}, _row {direction} LIMIT ?", values + [limit]
+
+def key_ranges(sort_key, nullable, descending, after, shard):
+    # The rows after the cursor on this shard, as conditions that are each
+    # one index range, so ties on the sort key are a seek too.
+    comparison = "<" if descending else ">"
+    if after is None:
+        return [("", [])]
+    after_key, after_shard, after_row = after
+    if not nullable:
+        return [(f"rowid {comparison} ?", [after_row])]
+
+    # Ties on the sort key are decided by the shard number, then rowid.
+    tie = f"{sort_key} IS NULL" if after_key is None else f"{sort_key} = ?"
+    tie_params = [] if after_key is None else [after_key]
+    if shard == after_shard:
+        ranges = [(f"{tie} AND rowid {comparison} ?", tie_params + [after_row])]
+    elif (shard > after_shard) != descending:
+        ranges = [(tie, tie_params)]
+    else:
+        ranges = []
+    if after_key is None:
+        # NULLs come first ascending, so every value follows them.
+        return ranges + ([] if descending else [(f"{sort_key} IS NOT NULL", [])])
+    ranges.append((f"{sort_key} {comparison} ?", [after_key]))
+    return ranges + ([(f"{sort_key} IS NULL", [])] if descending else [])
+
+def sqlite_order(value):
+    # SQLite sorts NULLs first, then numbers, then text.
+    if value is None or (isinstance(value, float) and value != value):
+        return (0, 0)
+    return (2, value) if isinstance(value, (str, bytes)) else (1, value)
+
+def fetch_page(table, columns, sort_column, descending, table_filter, after, limit):
+    def shard_page(item):
+        shard, target = item
+        sql, params = page_query(table, columns, sort_column, descending, table_filter, after, limit + 1, shard)
+        with target.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    # Each shard returns its own next page; the merged page is the first
+    # limit rows of all of them.
+    parts = fan_out(shard_page, enumerate(table_pools(table)))
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    if len(parts) > 1:
+        order = sorted(range(len(df)), reverse=descending, key=lambda i: (
+            sqlite_order(df["_sort_key"].iat[i]), df["_shard"].iat[i], df["_row"].iat[i]))
+        df = df.iloc[order].reset_index(drop=True)
+    has_next = len(df) > limit
+    return df.iloc[:limit], has_next
+
+@traced("page.database")
+def database():
     st.title("📊 Database")
 
-    table = st.selectbox("Choose a table to view:", ["plan", "User", "User_info", "progress"])
+    table = st.selectbox("Choose a table to view:", TABLES)
+    columns = table_columns(table)
 
-    query = f"SELECT * FROM {table}"
-    df = pd.read_sql_query(query, conn)
-    df.reset_index(drop=True, inplace=True)
+    with st.expander("View options"):
+        col1, col2 = st.columns(2)
+        with col1:
+            selected = st.multiselect("Columns", columns, default=columns) or columns
+            sort_choice = st.selectbox("Sort by", [ROW_ORDER] + sortable_columns(table))
+            descending = st.checkbox("Descending")
+        with col2:
+            filter_column = st.selectbox("Filter column", [NO_FILTER] + columns)
+            filter_operator = st.selectbox("Condition", list(FILTER_OPERATORS))
+            filter_value = st.text_input("Value")
+            page_size = st.selectbox("Rows per page", PAGE_SIZES)
 
-    st.subheader(f"`{table}` Table")
-    st.dataframe(df)
+    sort_column = None if sort_choice == ROW_ORDER else sort_choice
+    table_filter = None
+    if filter_column != NO_FILTER and filter_value != "":
+        table_filter = (filter_column, filter_operator, filter_value)
+
+    # Cursors of the pages visited so far; reset whenever the view changes.
+    view = (table, tuple(selected), sort_column, descending, table_filter, page_size, len(table_pools(table)))
+    if st.session_state.get("db_view") != view:
+        st.session_state.db_view = view
+        st.session_state.db_cursors = [None]
+    cursors = st.session_state.db_cursors
 
+    df, has_next = fetch_page(table, selected, sort_column, descending, table_filter, cursors[-1], page_size)
+    total = row_count(table, table_filter)
+
+    st.subheader(f"`{table}` Table")
+    st.caption(f"Page {len(cursors)} of {max(1, -(-total // page_size))} · {total} rows")
+    st.dataframe(df.drop(columns=["_sort_key", "_shard", "_row"]).reset_index(drop=True))
 
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        if st.button("⏮ First", disabled=len(cursors) == 1, use_container_width=True):
+            st.session_state.db_cursors = [None]
+            st.rerun()
+    with col2:
+        if st.button("◀ Previous", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col3:
+        if st.button("Next ▶", disabled=not has_next, use_container_width=True):
+            last = df.iloc[-1]
+            sort_key = last["_sort_key"]
+            if pd.isna(sort_key):
+                sort_key = None
+            elif hasattr(sort_key, "item"):
+                sort_key = sort_key.item()
+            cursors.append((sort_key, int(last["_shard"]), int(last["_row"])))
+            st.rerun()
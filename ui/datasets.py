@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_registry import file_hash
+
+# Typed columnar cache for the CSV/XLSX sources under data/. A source is
+# parsed once into .npy column blocks (strings as int32 codes plus their
+# categories); later loads memory-map the blocks, so numeric columns are
+# zero-copy. The cache is keyed by the source path and read options and
+# rebuilt whenever the source's content hash changes.
+
+CACHE_DIR = ".cache/datasets"
+# Bump when the on-disk layout changes; older caches are rebuilt.
+CACHE_FORMAT = 1
+
+_lock = threading.Lock()
+
+def _read_source(path, index_col=None):
+    if path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path, index_col=index_col)
+    return pd.read_csv(path, index_col=index_col)
+
+def _cache_dir(path, index_col):
+    key = hashlib.sha256(json.dumps([os.path.abspath(path), index_col]).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{os.path.basename(path)}-{key}")
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _encode_column(series):
+    column = {"name": series.name, "dtype": str(series.dtype)}
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        column["kind"] = "numeric"
+        return column, series.to_numpy()
+    codes, categories = pd.factorize(series, use_na_sentinel=True)
+    column["kind"] = "codes"
+    column["categories"] = [str(c) for c in categories]
+    return column, codes.astype(np.int32)
+
+def build(path, index_col=None):
+    data = _read_source(path, index_col)
+    directory = _cache_dir(path, index_col)
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    index = data.index
+    series = [data[name] for name in data.columns]
+    has_index = not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1)
+    if has_index:
+        series.insert(0, index.to_series(name=index.name))
+
+    # Columns of one storage dtype share a (columns x rows) block, so a load
+    # maps a handful of files whatever the column count; each column is a
+    # contiguous row of its block.
+    columns, blocks = [], {}
+    for s in series:
+        column, values = _encode_column(s)
+        block = blocks.setdefault(values.dtype.str, [])
+        column["block"], column["row"] = values.dtype.str, len(block)
+        block.append(values)
+        columns.append(column)
+    files = {}
+    for number, (dtype, arrays) in enumerate(blocks.items()):
+        files[dtype] = f"block{number}.npy"
+        np.save(os.path.join(tmp, files[dtype]), np.stack(arrays))
+
+    meta = {
+        "format": CACHE_FORMAT,
+        "source": path,
+        "sha256": file_hash(path),
+        "stat": _stat_key(path),
+        "rows": len(data),
+        "blocks": files,
+        "index": columns.pop(0) if has_index else None,
+        "columns": columns,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return meta
+
+def _read_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta if meta.get("format") == CACHE_FORMAT else None
+
+def _fresh_meta(path, index_col):
+    directory = _cache_dir(path, index_col)
+    meta_path = os.path.join(directory, "meta.json")
+    meta = _read_meta(meta_path)
+    if meta is not None:
+        # Trust an unchanged stat; rehash only when it moved.
+        if meta["stat"] == _stat_key(path):
+            return directory, meta
+        if meta["sha256"] == file_hash(path):
+            meta["stat"] = _stat_key(path)
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=2)
+            return directory, meta
+    with _lock:
+        return directory, build(path, index_col)
+
+def _map_blocks(directory, meta):
+    # np.asarray drops the memmap subclass but keeps the mapping.
+    return {dtype: np.asarray(np.load(os.path.join(directory, name), mmap_mode="r"))
+            for dtype, name in meta["blocks"].items()}
+
+def _read_column(blocks, column, dtype=object):
+    values = blocks[column["block"]][column["row"]]
+    if column["kind"] == "numeric":
+        return values
+    # Decoded in the target dtype, so only the few categories get converted;
+    # code -1 (missing) becomes that dtype's NA.
+    return pd.array(column["categories"], dtype=dtype).take(values, allow_fill=True)
+
+def load_columns(path, index_col=None):
+    # Name -> array for every column; numeric ones are read-only mapped views.
+    directory, meta = _fresh_meta(path, index_col)
+    blocks = _map_blocks(directory, meta)
+    return {column["name"]: np.asarray(_read_column(blocks, column)) for column in meta["columns"]}
+
+def load(path, index_col=None):
+    # The DataFrame pd.read_csv/pd.read_excel would return, from the cache.
+    directory, meta = _fresh_meta(path, index_col)
+    blocks = _map_blocks(directory, meta)
+    data = pd.DataFrame(
+        {c["name"]: pd.Series(_read_column(blocks, c, c["dtype"]), copy=False) for c in meta["columns"]},
+        copy=False,
+    )
+    if meta["index"] is not None:
+        index = meta["index"]
+        data.index = pd.Index(_read_column(blocks, index, index["dtype"]), name=index["name"])
+    return data
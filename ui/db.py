@@ -0,0 +1,223 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from migrations import migrate
+from tracing import count, span
+
+DB_PATH = os.environ.get("FITNESS_COACH_DB", "database/FitnessCoach.db")
+POOL_SIZE = int(os.environ.get("FITNESS_COACH_DB_POOL", "8"))
+# Shard manifest written by shards.py; see ShardRouter. Unless set, it is
+# shards.json next to the directory database, where `shards.py split`
+# writes it.
+SHARDS_PATH = os.environ.get("FITNESS_SHARDS", "")
+FAN_OUT_WORKERS = int(os.environ.get("FITNESS_SHARD_WORKERS", "8"))
+BUSY_TIMEOUT_SECONDS = 10.0
+ACQUIRE_TIMEOUT_SECONDS = 30.0
+# Per-connection LRU of compiled statements; the pages only use a few dozen.
+CACHED_STATEMENTS = 256
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    # Safe with WAL: a power loss can drop the last commits but never corrupts.
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_SECONDS * 1000)}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+]
+
+# Tables whose rows belong to one user, and so live in that user's shard. The
+# cohort rollups are kept per shard as well and summed on read.
+USER_TABLES = ["User_info", "plan", "progress", "progress_summary", "progress_rollup"]
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._created = 0
+        self._migrated = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            if not self._migrated:
+                migrate(conn)
+                self._migrated = True
+            self._created += 1
+        count("db.connections_opened")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS):
+            raise sqlite3.OperationalError(f"No free connection to {self.path} after {ACQUIRE_TIMEOUT_SECONDS}s")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                # Never hand a half-finished transaction to the next session.
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn, span("db.transaction"):
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        return {"path": self.path, "size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+class ShardRouter:
+    # Per-user rows live in one file per shard, picked by user_id % shards;
+    # accounts (the User table, which hands out the ids) stay in the
+    # directory database. The manifest is re-checked on every lookup (one
+    # stat), so running processes follow an online split without a restart.
+    # Until it exists everything is in the directory, so every process
+    # routes through one, split or not.
+
+    def __init__(self, manifest, directory, size=POOL_SIZE):
+        self.manifest = manifest
+        self.directory = directory
+        self.size = size
+        self._stamp = None
+        self._shards = []
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with open(self.manifest) as f:
+            layout = json.load(f)
+        base = os.path.dirname(os.path.abspath(self.manifest))
+        shards = []
+        for path in layout["shards"]:
+            path = os.path.join(base, path)
+            if path not in self._pools:
+                self._pools[path] = ConnectionPool(path, self.size)
+            shards.append(self._pools[path])
+        return shards
+
+    def shards(self):
+        try:
+            stat = os.stat(self.manifest)
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._shards = self._load() if stamp is not None else []
+                    self._stamp = stamp
+        return self._shards
+
+    def pool_for(self, user_id):
+        shards = self.shards()
+        return shards[int(user_id) % len(shards)] if shards else self.directory
+
+    def pools(self):
+        return self.shards() or [self.directory]
+
+    def close(self):
+        for shard in self._pools.values():
+            shard.close()
+
+    def stats(self):
+        return {"manifest": self.manifest, "shards": [shard.stats() for shard in self.shards()]}
+
+def default_manifest(path):
+    return os.path.join(os.path.dirname(path), "shards.json")
+
+pool = ConnectionPool(DB_PATH)
+router = ShardRouter(SHARDS_PATH or default_manifest(DB_PATH), pool)
+_fan_out = None
+_fan_out_lock = threading.Lock()
+
+def configure(path, size=POOL_SIZE, shards=None):
+    global pool, router
+    old, pool = pool, ConnectionPool(path, size)
+    old_router, router = router, ShardRouter(shards or default_manifest(path), pool, size)
+    old.close()
+    old_router.close()
+    return pool
+
+def close():
+    pool.close()
+    router.close()
+
+def pool_for(user_id=None):
+    # The pool holding user_id's rows; the directory database when None or unsharded.
+    return pool if user_id is None else router.pool_for(user_id)
+
+def user_pools():
+    # Every pool holding per-user tables: the shards, or just the directory.
+    return router.pools()
+
+def connection(user_id=None):
+    return pool_for(user_id).connection()
+
+def transaction(user_id=None):
+    return pool_for(user_id).transaction()
+
+def fetch_one(sql, params=(), user_id=None):
+    with span("db.fetch_one"), pool_for(user_id).connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+def fetch_all(sql, params=(), user_id=None):
+    with span("db.fetch_all"), pool_for(user_id).connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def fan_out(fn, items):
+    # fn(item) for every item (typically one per shard) in parallel; results in order.
+    global _fan_out
+    items = list(items)
+    with span("db.fan_out", items=len(items)):
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        if _fan_out is None:
+            with _fan_out_lock:
+                if _fan_out is None:
+                    _fan_out = ThreadPoolExecutor(FAN_OUT_WORKERS, thread_name_prefix="db-fan-out")
+        return list(_fan_out.map(fn, items))
+
+def _on_pool(target, fn):
+    with target.connection() as conn:
+        return fn(conn)
+
+def on_shards(fn):
+    # fn(conn) against every shard in parallel; the results in shard order.
+    return fan_out(lambda target: _on_pool(target, fn), user_pools())
+
+def stats():
+    return {"directory": pool.stats(), "shards": router.stats()["shards"] or None}
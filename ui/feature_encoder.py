@@ -0,0 +1,156 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_registry import get_model, model_version
+
+GYM_FEATURES = ["Sex", "Age", "Height", "Weight", "Hypertension", "Diabetes", "BMI", "Level", "Fitness Goal", "Fitness Type"]
+DIET_FEATURES = [
+    "Age", "Gender", "Weight_kg", "Height_cm", "BMI", "Disease_Type", "Severity", "Physical_Activity_Level",
+    "Daily_Caloric_Intake", "Cholesterol_mg/dL", "Blood_Pressure_mmHg", "Glucose_mg/dL",
+    "Dietary_Restrictions", "Allergies", "Preferred_Cuisine",
+    "Weekly_Exercise_Hours", "Adherence_to_Diet_Plan", "Dietary_Nutrient_Imbalance_Score",
+]
+
+# Model feature -> profile field it is read from. Profile fields use the
+# User_info column names plus the derived height_m.
+GYM_SOURCES = {
+    "Sex": "Gender", "Age": "Age", "Height": "height_m", "Weight": "Weight",
+    "Hypertension": "Disease_Type", "Diabetes": "Disease_Type", "BMI": "BMI", "Level": "level",
+    "Fitness Goal": "Fitness Goal", "Fitness Type": "Fitness Type",
+}
+DIET_SOURCES = {
+    "Age": "Age", "Gender": "Gender", "Weight_kg": "Weight", "Height_cm": "height", "BMI": "BMI",
+    "Disease_Type": "Disease_Type", "Severity": "Severity", "Physical_Activity_Level": "Physical_Activity_Level",
+    "Daily_Caloric_Intake": "Daily_Caloric_Intake", "Cholesterol_mg/dL": "Cholesterol",
+    "Blood_Pressure_mmHg": "Blood_Pressure", "Glucose_mg/dL": "Glucose",
+    "Dietary_Restrictions": "Dietary_Restrictions", "Allergies": "Allergies",
+    "Preferred_Cuisine": "Preferred_Cuisine", "Weekly_Exercise_Hours": "Weekly_Exercise_Hours",
+    "Adherence_to_Diet_Plan": "Adherence_to_Diet_Plan",
+    "Dietary_Nutrient_Imbalance_Score": "Dietary_Nutrient_Imbalance_Score",
+}
+
+DISEASES = ["None", "Hypertension", "Diabetes", "Obesity"]
+# Spellings in the training data that differ from the form's options.
+LABEL_ALIASES = {"Obuse": "Obese"}
+
+def level_code(bmi):
+    # Same bands as planner.get_weight_category, as gym encoder codes.
+    if bmi < 18.5:
+        return 3
+    elif 18.5 <= bmi < 24.9:
+        return 0
+    elif 25 <= bmi < 29.9:
+        return 2
+    else:
+        return 1
+
+def weight_categories(bmi):
+    return np.select(
+        [bmi < 18.5, (bmi >= 18.5) & (bmi < 24.9), (bmi >= 25) & (bmi < 29.9)],
+        ["Underweight", "Normal", "Overweight"],
+        "Obese",
+    )
+
+def form_label(label):
+    if isinstance(label, float) and np.isnan(label):
+        return "None"
+    label = LABEL_ALIASES.get(label, label)
+    return str(label).replace("_", " ")
+
+def class_map(encoder):
+    return {form_label(label): code for code, label in enumerate(encoder.classes_)}
+
+class FeatureEncoder:
+    def __init__(self, features, sources, maps):
+        self.features = list(features)
+        self.sources = [sources[f] for f in self.features]
+        self.maps = [maps.get(f) for f in self.features]
+        self.width = len(self.features)
+
+    def encode_record(self, record, out=None):
+        if out is None:
+            out = np.empty((1, self.width), dtype=np.float32)
+        row = out[0]
+        for i, (source, mapping) in enumerate(zip(self.sources, self.maps)):
+            value = record[source]
+            try:
+                row[i] = mapping[value] if mapping is not None else value
+            except (KeyError, TypeError):
+                # The same error encode_columns raises, so callers see one kind.
+                raise ValueError(f"Unknown {source} values: [{value!r}]") from None
+        return out
+
+    def encode_columns(self, columns, out=None):
+        n = len(columns[self.sources[0]])
+        if out is None:
+            out = np.empty((n, self.width), dtype=np.float32)
+        for i, (source, mapping) in enumerate(zip(self.sources, self.maps)):
+            values = np.asarray(columns[source])
+            if mapping is None:
+                out[:, i] = values
+                continue
+            # Map the distinct labels once, then broadcast back through the inverse index.
+            uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+            unknown = [u for u in uniques if u not in mapping]
+            if unknown:
+                raise ValueError(f"Unknown {source} values: {unknown}")
+            out[:, i] = np.array([mapping[u] for u in uniques], dtype=np.float32)[inverse.ravel()]
+        return out
+
+    def frame(self, matrix):
+        return pd.DataFrame(matrix, columns=self.features, copy=False)
+
+    def validate(self, model):
+        names = getattr(model, "feature_names_in_", None)
+        if names is None and hasattr(model, "get_booster"):
+            names = model.get_booster().feature_names
+        if names is not None and list(names) != self.features:
+            raise ValueError(f"Model expects features {list(names)}, encoder produces {self.features}")
+
+def build_gym_encoder(encoders):
+    hypertension, diabetes = class_map(encoders["Hypertension"]), class_map(encoders["Diabetes"])
+    maps = {
+        "Sex": class_map(encoders["Sex"]),
+        "Hypertension": {d: hypertension["Yes" if d == "Hypertension" else "No"] for d in DISEASES},
+        "Diabetes": {d: diabetes["Yes" if d == "Diabetes" else "No"] for d in DISEASES},
+        "Level": class_map(encoders["Level"]),
+        "Fitness Goal": class_map(encoders["Fitness Goal"]),
+        "Fitness Type": class_map(encoders["Fitness Type"]),
+    }
+    return FeatureEncoder(GYM_FEATURES, GYM_SOURCES, maps)
+
+def build_diet_encoder(encoders):
+    categorical = [f for f in DIET_FEATURES if f in encoders]
+    return FeatureEncoder(DIET_FEATURES, DIET_SOURCES, {f: class_map(encoders[f]) for f in categorical})
+
+_BUILDERS = {
+    "gym": ("gym_encoders", build_gym_encoder),
+    "diet": ("diet_encoders", build_diet_encoder),
+}
+_encoders = {}
+_validated = {}
+_lock = threading.Lock()
+
+def get_encoder(name):
+    source, build = _BUILDERS[name]
+    version = model_version(source)
+    cached = _encoders.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        cached = _encoders.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, build(get_model(source)))
+            _encoders[name] = cached
+    return cached[1]
+
+def get_validated_model(name):
+    model = get_model(name)
+    encoder = get_encoder(name)
+    if _validated.get(name) != (id(model), id(encoder)):
+        encoder.validate(model)
+        _validated[name] = (id(model), id(encoder))
+    return model
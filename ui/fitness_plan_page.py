@@ -1,116 +1,59 @@
 import streamlit as st
-import joblib
-import sqlite3
+from charts import show_weight_chart
+from db import fetch_one
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-
-def recommendations(text):
-    text = text.strip()
-
-    if "Here are some important tips:-" in text:
-        intro, tips = text.split("Here are some important tips:-", 1)
-        intro = intro.strip()
-        tips = tips.strip()
-
-        intro_lines = [line.strip() for line in intro.split('.') if line.strip()]
-        intro_bullets = [f"- {line}." for line in intro_lines]
-
-        tips_lines = [line.strip() for line in tips.replace("\n", ".").split('.') if line.strip()]
-        tips_bullets = [f"- {line}." for line in tips_lines]
-
-        full_text = "\n".join(intro_bullets) + "\n\n**Here are some important tips:**\n" + "\n".join(tips_bullets)
-    else:
-        lines = [line.strip() for line in text.split('.') if line.strip()]
-        full_text = "\n".join(f"- {line}." for line in lines)
-
-    return full_text
-
-def bullet_points(text):
-    text = text.replace(", and ", ", ")
-    text = text.replace(" and ", ", ")
-
-    items = [item.strip().capitalize() for item in text.split(",") if item.strip()]
-    
-    return "\n".join(f"- {item}" for item in items)
-
-def diet_section(diet_text):   
-    sections = [section.strip() for section in diet_text.split(";") if section.strip()]
-    
-    emojis = {
-        "Vegetables": "🥕",
-        "Protein Intake": "🍗",
-        "Juice": "🍹"
-    }
-    
-    formatted = []
-    for section in sections:
-        if ":" in section:
-            key, value = section.split(":", 1)
-            key = key.strip()
-            value = value.strip().strip("()")
-            emoji = emojis.get(key, "")
-            formatted.append(f"    - {emoji} **{key}**: {value}\n  ")
-        else:
-            formatted.append(f"    - {section}  ")
-    
-    return "\n".join(formatted)
+from datetime import date, datetime, timedelta
+from plan_client import get_client
+from plan_decoder import gym_plan, diet_label
+from progress_store import HISTORY_ROWS, eta_days, get_summary, latest_means, recent_entries, trend_per_day, weight_timeline
+from tracing import session_profiled, traced
 
 def get_gym_prediction(gym_prediction):
-    encoders = joblib.load("encoders/gym_encoders.pkl")  
-    fitness_plan_encoder = encoders['Fitness Plan'] 
-    fitness_plan = fitness_plan_encoder.inverse_transform([gym_prediction])[0]
-
-    fitness_plan_sections = fitness_plan.split(" | ")
-    exercises = fitness_plan_sections[0]
-    diet = fitness_plan_sections[1]
-    equipment = fitness_plan_sections[2]
-    recommendation = fitness_plan_sections[3]
-
-    return exercises, diet, equipment, recommendation
+    return gym_plan(gym_prediction)
 
 def get_diet_type(diet_prediction):
-    encoders = joblib.load("encoders/diet_encoders.pkl") 
-    encoder = encoders['Diet_Recommendation'] 
-    diet_type = encoder.inverse_transform([diet_prediction])[0]
-    return diet_type
+    return diet_label(diet_prediction)
 
 def get_rec_from_db():
-    conn = sqlite3.connect('database/FitnessCoach.db', check_same_thread=False)
-    cursor = conn.cursor()
-
     user_id = st.session_state.user_id 
 
-    cursor.execute("SELECT gym_rec, diet_rec FROM plan WHERE user_id = ?", (user_id,))
-    result = cursor.fetchone()
+    result = get_client().get_plan(user_id)
 
-    gym_rec, diet_rec = result
+    gym_rec, diet_rec = result["gym_rec"], result["diet_rec"]
 
     return gym_rec, diet_rec
 
+def get_session_plan():
+    # The plan only changes when the form is submitted again (form_page
+    # drops this key), so it is fetched and decoded once per session.
+    cached = st.session_state.get("plan")
+    if cached is None or cached[0] != st.session_state.user_id:
+        gym_prediction, diet_prediction = get_rec_from_db()
+        cached = (st.session_state.user_id, get_gym_prediction(gym_prediction), get_diet_type(diet_prediction))
+        st.session_state.plan = cached
+    return cached[1], cached[2]
+
+@traced("page.fitness_plan")
 def fitness_plan():
-    gym_prediction, diet_prediction = get_rec_from_db()
-
-    exercises, diet, equipment, recommendation = get_gym_prediction(gym_prediction)
-    diet_type = get_diet_type(diet_prediction)
+    plan, diet_type = get_session_plan()
 
     st.title("🏅 Your Personalized Fitness Plan")
     st.divider()
 
     st.markdown(f"<h3 style='color:#4caf50;'>🥗 Recommended Diet: <span style='color:#2e7d32;'><strong>{diet_type}</strong></span></h3>", unsafe_allow_html=True)
-    st.success(diet_section(diet))
+    st.success(plan.diet_md)
 
     col1, col2 = st.columns([2, 2])
     with col1:
         st.markdown("<h3 style='color:#0764a3;'>🏃🏻‍♂️‍➡️ Recommended Workouts</h3>", unsafe_allow_html=True)
-        st.info(bullet_points(exercises))
+        st.info(plan.exercises_md)
 
     with col2:
         st.markdown("<h3 style='color:#e31f0e;'>🏋️‍♂️ Equipment Required</h3>", unsafe_allow_html=True)
-        st.error(bullet_points(equipment))
+        st.error(plan.equipment_md)
 
     st.markdown("<h3 style='color:#db613b;'>💡 General Advice</h3>", unsafe_allow_html=True)
-    st.warning(recommendations(recommendation))
+    st.warning(plan.recommendation_md)
 
 def calculate_target_weight(height_cm, current_weight, fitness_goal):
     height_m = height_cm / 100
@@ -139,14 +82,24 @@ def calculate_target_weight(height_cm, current_weight, fitness_goal):
     target_weight = round(target_bmi * (height_m ** 2), 1)
     return target_weight, None
 
+def record_weight_update(current_weight):
+    # Runs before the fragment rerun the submit triggers, so that rerun
+    # already reads the new entry; no st.rerun() needed.
+    get_client().record_weight(st.session_state.user_id, current_weight,
+                               st.session_state.new_weight, st.session_state.update_date)
+    st.session_state.weight_updated = True
+
+# A fragment: a weight update reruns only this section, not the whole app
+# (and not the plan above it).
+@st.fragment
+@session_profiled(st.session_state, "progress_tracking")
+@traced("page.progress_tracking")
 def progress_tracking():
     st.title("📈 **Track Your Progress**")
     st.divider()
-    conn = sqlite3.connect("database/FitnessCoach.db", check_same_thread=False)
-    cursor = conn.cursor()
 
-    cursor.execute("SELECT height, Weight, \"Fitness Goal\" FROM User_info WHERE user_id = ?", (st.session_state.user_id,))
-    user_info = cursor.fetchone()
+    user_id = st.session_state.user_id
+    user_info = fetch_one("SELECT height, Weight, \"Fitness Goal\" FROM User_info WHERE user_id = ?", (user_id,), user_id=user_id)
     user_height, current_weight, fitness_goal = user_info
 
     target_weight, warning = calculate_target_weight(user_height, current_weight, fitness_goal)
@@ -177,85 +130,52 @@ def progress_tracking():
                 progress_ratio = max(0.0, min(progress_ratio, 1.0))
 
 
+    summary = get_summary(st.session_state.user_id)
+    slope = trend_per_day(summary)
+
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("###### Progress Toward Target Weight:")
         st.progress(progress_ratio)
+    with col2:
+        if slope is not None:
+            st.markdown("###### Trend:")
+            means = latest_means(st.session_state.user_id)
+            trend = f"{slope * 7:+.2f} kg/week · latest weekly average {means['week']:.1f} kg · monthly {means['month']:.1f} kg"
+            eta = None if warning else eta_days(summary, target_weight)
+            if eta is not None:
+                trend += f" · target around {date.today() + timedelta(days=round(eta)):%d/%m/%Y}"
+            st.caption(trend)
 
     st.divider()
 
     st.subheader("Weight Update:")
     with st.form("weight_update"):
-        new_weight = st.number_input(f"Enter new weight (kg):", min_value=40)
-        update_date = st.date_input("Select the date of this update")
-        submit = st.form_submit_button("Update")
-
-    if submit:
-        cursor.execute("UPDATE User_info SET Weight = ? WHERE user_id = ?", (new_weight, st.session_state.user_id))
-        
-        cursor.execute(
-            "INSERT INTO Progress (user_id, previous_weight, new_weight, date) VALUES (?, ?, ?, ?)",
-            (st.session_state.user_id, current_weight, new_weight, update_date.strftime("%d-%m-%Y"))
-        )  
-        conn.commit()
+        st.number_input(f"Enter new weight (kg):", min_value=40, key="new_weight")
+        st.date_input("Select the date of this update", key="update_date")
+        st.form_submit_button("Update", on_click=record_weight_update, args=(current_weight,))
 
+    if st.session_state.pop("weight_updated", False):
         st.success("Weight updated successfully!")
-        st.rerun()
 
     st.divider()
 
     st.subheader("📈 Progress History")
-    cursor.execute(
-        "SELECT previous_weight, new_weight, date FROM progress WHERE user_id = ? ORDER BY date",
-        (st.session_state.user_id,)
-    )
-    progress_data = cursor.fetchall()
-
-    weight_timeline = []
-
-    if progress_data:
-        df = pd.DataFrame(progress_data, columns=["Previous Weight", "New Weight", "Date"])
+    if summary is not None:
+        df = pd.DataFrame(recent_entries(st.session_state.user_id), columns=["Previous Weight", "New Weight", "Date"])
         st.dataframe(df)
+        if summary.entries > HISTORY_ROWS:
+            st.caption(f"Showing the latest {HISTORY_ROWS} of {summary.entries} updates.")
 
-        df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-        start_date = df["Date"].iloc[0] - timedelta(days=1)
-        weight_timeline.append((start_date, df["Previous Weight"].iloc[0]))
-
-        for _, row in df.iterrows():
-            weight_timeline.append((row["Date"], row["New Weight"]))
+        timeline = weight_timeline(st.session_state.user_id, summary.version)
 
     else:
         st.info("No progress records yet. Start tracking your weight to see a detailed history!")
-        weight_timeline.append((datetime.today(), current_weight))
+        timeline = [(datetime.today(), current_weight)]
 
-    timeline_df = pd.DataFrame(weight_timeline, columns=["Date", "Weight"])
-    timeline_df["Date"] = pd.to_datetime(timeline_df["Date"], dayfirst=True)
+    chart_key = (st.session_state.user_id, summary.version if summary else 0, current_weight, date.today())
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("📉 Weight Change Over Time")
-        
-        import matplotlib.dates as mdates
-
-        fig, ax = plt.subplots()
-
-        ax.plot(timeline_df["Date"], timeline_df["Weight"], marker='o', linestyle='-')
-
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Weight (kg)")
-        ax.set_title("Weight Progress")
-        ax.grid(True)
-
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y')) 
-        ax.xaxis.set_major_locator(mdates.AutoDateLocator()) 
-
-        fig.autofmt_xdate(rotation=30)
-
-        min_w = timeline_df["Weight"].min()
-        max_w = timeline_df["Weight"].max()
-        padding = 2
-        ax.set_ylim(min_w - padding, max_w + padding)
-
-        st.pyplot(fig)
-
-    
+        show_weight_chart(timeline, chart_key)
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from feature_encoder import GYM_FEATURES, level_code
+from model_registry import get_model, registry
+from tree_export import get_predictor
+
+# The registry watches the meta, which names its table file: a new table is
+# written under its own name first, so replacing the meta swaps the pair at once.
+META_PATH = "models/gym_lookup.json"
+
+FEATURES = GYM_FEATURES
+BINARY_FEATURES = ["Sex", "Hypertension", "Diabetes", "Fitness Goal", "Fitness Type"]
+MISSING = 255
+
+DEFAULT_AGES = (18, 80)
+DEFAULT_HEIGHTS_CM = (140, 200)
+DEFAULT_WEIGHTS = (35, 150)
+
+def bmi_grid(heights_cm, weights):
+    # Python's round, not np.round, so cells match the form's BMI bit for bit.
+    bmi = np.array([[round(w / pow(h / 100, 2), 2) for w in weights] for h in heights_cm])
+    level = np.vectorize(level_code)(bmi).astype(np.float64)
+    return bmi, level
+
+class GymLookup:
+    def __init__(self, table, meta):
+        self.table = table
+        self.meta = meta
+        self.ages = np.arange(meta["ages"][0], meta["ages"][1] + 1)
+        self.heights_cm = np.arange(meta["heights_cm"][0], meta["heights_cm"][1] + 1)
+        self.weights = np.arange(meta["weights"][0], meta["weights"][1] + 1)
+        self.bmi, self.level = bmi_grid(self.heights_cm, self.weights)
+        # The models see float32 inputs, so exact-match checks happen there too.
+        self.height_m32 = (self.heights_cm / 100).astype(np.float32)
+        self.bmi32 = self.bmi.astype(np.float32)
+
+    def lookup(self, X, snap=False):
+        X = np.asarray(X, dtype=np.float32)
+        cols = dict(zip(FEATURES, X.T))
+        height_cm = cols["Height"].astype(np.float64) * 100
+
+        age_q = np.rint(cols["Age"])
+        height_q = np.rint(height_cm)
+        weight_q = np.rint(cols["Weight"])
+        ai = age_q.astype(np.int64) - self.ages[0]
+        hi = height_q.astype(np.int64) - self.heights_cm[0]
+        wi = weight_q.astype(np.int64) - self.weights[0]
+
+        hit = ((ai >= 0) & (ai < len(self.ages))
+               & (hi >= 0) & (hi < len(self.heights_cm))
+               & (wi >= 0) & (wi < len(self.weights)))
+        for name in BINARY_FEATURES:
+            hit &= (cols[name] == 0) | (cols[name] == 1)
+
+        if not snap:
+            # BMI and Level are derived inputs; anything not computed the way
+            # the grid was built has to go to the model.
+            hi_c, wi_c = np.where(hit, hi, 0), np.where(hit, wi, 0)
+            hit &= ((cols["Age"] == age_q)
+                    & (cols["Height"] == self.height_m32[hi_c])
+                    & (cols["Weight"] == weight_q)
+                    & (cols["BMI"] == self.bmi32[hi_c, wi_c])
+                    & (cols["Level"] == self.level[hi_c, wi_c]))
+
+        labels = np.full(len(X), MISSING, dtype=np.int64)
+        if hit.any():
+            index = tuple(cols[name][hit].astype(np.int64) for name in BINARY_FEATURES)
+            labels[hit] = self.table[index + (ai[hit], hi[hit], wi[hit])]
+        hit &= labels != MISSING
+        return labels, hit
+
+def load_lookup(meta_path):
+    with open(meta_path) as f:
+        meta = json.load(f)
+    table_path = os.path.join(os.path.dirname(meta_path), meta["table"])
+    return GymLookup(np.load(table_path, mmap_mode="r"), meta)
+
+registry.register("gym_lookup", META_PATH, loader=load_lookup)
+
+def active_lookup():
+    if not registry.exists("gym_lookup"):
+        return None
+    lookup = get_model("gym_lookup")
+    # A table compiled from another model is stale; ignore it until rebuilt.
+    if registry.exists("gym") and registry.fingerprint("gym") != lookup.meta["model_sha256"]:
+        return None
+    return lookup
+
+def predict(gym_features, snap=False):
+    lookup = active_lookup()
+    if lookup is None:
+        return get_predictor("gym").predict(gym_features)
+
+    labels, hit = lookup.lookup(gym_features[FEATURES].to_numpy(), snap=snap)
+    if not hit.all():
+        labels[~hit] = get_predictor("gym").predict(gym_features[~hit])
+    return labels
+
+def grid_features(sex, hypertension, diabetes, fitness_goal, fitness_type, ages, heights_cm, weights, bmi, level):
+    n_h, n_w = len(heights_cm), len(weights)
+    block = len(ages) * n_h * n_w
+    age = np.repeat(ages, n_h * n_w)
+    height = np.tile(np.repeat(heights_cm / 100, n_w), len(ages))
+    weight = np.tile(weights, len(ages) * n_h)
+    return pd.DataFrame({
+        "Sex": np.full(block, sex),
+        "Age": age,
+        "Height": height,
+        "Weight": weight,
+        "Hypertension": np.full(block, hypertension),
+        "Diabetes": np.full(block, diabetes),
+        "BMI": np.tile(bmi.ravel(), len(ages)),
+        "Level": np.tile(level.ravel(), len(ages)),
+        "Fitness Goal": np.full(block, fitness_goal),
+        "Fitness Type": np.full(block, fitness_type),
+    })
+
+def compile_lookup(ages=DEFAULT_AGES, heights_cm=DEFAULT_HEIGHTS_CM, weights=DEFAULT_WEIGHTS, verbose=True):
+    model = get_model("gym")
+    age_axis = np.arange(ages[0], ages[1] + 1)
+    height_axis = np.arange(heights_cm[0], heights_cm[1] + 1)
+    weight_axis = np.arange(weights[0], weights[1] + 1)
+    bmi, level = bmi_grid(height_axis, weight_axis)
+
+    shape = (2, 2, 2, 2, 2, len(age_axis), len(height_axis), len(weight_axis))
+    table = np.full(shape, MISSING, dtype=np.uint8)
+    start = time.perf_counter()
+    for combo in np.ndindex(*shape[:5]):
+        features = grid_features(*combo, age_axis, height_axis, weight_axis, bmi, level)
+        table[combo] = np.asarray(model.predict(features)).reshape(shape[5:])
+        if verbose:
+            print(f"compiled {combo} ({time.perf_counter() - start:.1f}s)")
+
+    directory, stem = os.path.dirname(META_PATH), os.path.splitext(os.path.basename(META_PATH))[0]
+    table_name = f"{stem}-{hashlib.sha256(table.tobytes()).hexdigest()[:16]}.npy"
+    meta = {
+        "table": table_name,
+        "model_sha256": registry.fingerprint("gym"),
+        "ages": list(ages),
+        "heights_cm": list(heights_cm),
+        "weights": list(weights),
+        "shape": list(shape),
+        "compile_seconds": round(time.perf_counter() - start, 3),
+    }
+    table_path = os.path.join(directory, table_name)
+    with open(table_path + ".tmp", "wb") as f:
+        np.save(f, table)
+    os.replace(table_path + ".tmp", table_path)
+    with open(META_PATH + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(META_PATH + ".tmp", META_PATH)
+    # Processes still holding an older table keep their mapping after the unlink.
+    for old in glob.glob(os.path.join(directory, f"{stem}-*.npy")):
+        if old != table_path:
+            os.remove(old)
+    return meta
+
+def agreement_report(data_path="data/cleaned_gym_data.csv", samples=5000, seed=42):
+    model = get_model("gym")
+    lookup = get_model("gym_lookup")
+    rng = np.random.default_rng(seed)
+
+    # Random grid cells: the table should reproduce the model exactly.
+    cells = np.stack([rng.integers(0, n, samples) for n in lookup.table.shape], axis=1)
+    sampled = pd.DataFrame({
+        "Sex": cells[:, 0],
+        "Age": lookup.ages[cells[:, 5]],
+        "Height": lookup.heights_cm[cells[:, 6]] / 100,
+        "Weight": lookup.weights[cells[:, 7]],
+        "Hypertension": cells[:, 1],
+        "Diabetes": cells[:, 2],
+        "BMI": lookup.bmi[cells[:, 6], cells[:, 7]],
+        "Level": lookup.level[cells[:, 6], cells[:, 7]],
+        "Fitness Goal": cells[:, 3],
+        "Fitness Type": cells[:, 4],
+    })[FEATURES]
+    grid_labels, _ = lookup.lookup(sampled.to_numpy())
+    grid_agreement = float(np.mean(grid_labels == np.asarray(model.predict(sampled))))
+
+    # Real profiles: how many hit the grid exactly, and what snapping the
+    # rest to the nearest cell would cost against the model and the labels.
+    data = datasets.load(data_path)
+    X = data[FEATURES]
+    truth = data["Fitness Plan"].to_numpy()
+    model_labels = np.asarray(model.predict(X))
+    _, exact_hit = lookup.lookup(X.to_numpy())
+    snapped, snap_hit = lookup.lookup(X.to_numpy(), snap=True)
+    served = np.where(snap_hit, snapped, model_labels)
+
+    return {
+        "grid_samples": samples,
+        "grid_agreement": grid_agreement,
+        "dataset_rows": len(data),
+        "exact_coverage": float(exact_hit.mean()),
+        "snapped_coverage": float(snap_hit.mean()),
+        "snapped_agreement": float(np.mean(snapped[snap_hit] == model_labels[snap_hit])) if snap_hit.any() else None,
+        "model_accuracy": float(np.mean(model_labels == truth)),
+        "snapped_accuracy": float(np.mean(served == truth)),
+        "table_bytes": int(lookup.table.nbytes),
+    }
+
+def parse_range(text):
+    low, high = text.split(":")
+    return int(low), int(high)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the gym model into a lookup table over the form's input grid.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("compile")
+    build.add_argument("--ages", type=parse_range, default=DEFAULT_AGES)
+    build.add_argument("--heights-cm", type=parse_range, default=DEFAULT_HEIGHTS_CM)
+    build.add_argument("--weights", type=parse_range, default=DEFAULT_WEIGHTS)
+
+    report = sub.add_parser("report")
+    report.add_argument("--data", default="data/cleaned_gym_data.csv")
+    report.add_argument("--samples", type=int, default=5000)
+
+    args = parser.parse_args()
+    if args.command == "compile":
+        print(json.dumps(compile_lookup(args.ages, args.heights_cm, args.weights), indent=2))
+    else:
+        print(json.dumps(agreement_report(args.data, args.samples), indent=2))
+
+if __name__ == "__main__":
+    main()
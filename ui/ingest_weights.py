@@ -0,0 +1,255 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from collections import Counter, namedtuple
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+import cohort_analytics
+import db
+import progress_store
+
+# Bulk weigh-ins from smart-scale and wearable exports (CSV or JSONL, either
+# optionally gzipped), streamed in batches so memory stays flat however large
+# the file. Each member keeps one progress entry per day, the day's first
+# reading: within a batch the earliest timestamp wins, and a day that already
+# has an entry (from the form or an earlier import) is left alone, so
+# re-importing an overlapping export adds nothing. Every batch is one
+# transaction per shard, and sets each member's current Weight once.
+
+BATCH_ROWS = 50000
+MIN_KG, MAX_KG = 20.0, 400.0
+POUND_KG = 0.45359237
+# Numbers (or digit strings) are epoch seconds, or milliseconds, only inside
+# 2000-01-01..2100-01-01; other digit strings such as 20260101 are ISO dates.
+EPOCH_SECONDS = (946684800.0, 4102444800.0)
+
+# Export column names we accept, per field.
+USER_FIELDS = ["user_id", "User_ID", "userId", "user", "member_id"]
+TIME_FIELDS = ["timestamp", "time", "measured_at", "datetime", "date", "day"]
+WEIGHT_FIELDS = {"weight": 1.0, "weight_kg": 1.0, "Weight": 1.0, "new_weight": 1.0,
+                 "weight_lb": POUND_KG, "weight_lbs": POUND_KG}
+
+Reading = namedtuple("Reading", ["user_id", "day", "when", "weight"])
+
+class InvalidReading(ValueError):
+    pass
+
+def _field(record, names):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+def _epoch_seconds(value):
+    if isinstance(value, str) and not value.replace(".", "", 1).isdigit():
+        return None
+    seconds = float(value)
+    for scale in (1.0, 1000.0):
+        if EPOCH_SECONDS[0] <= seconds / scale < EPOCH_SECONDS[1]:
+            return seconds / scale
+    return None
+
+def _moment(value):
+    # (day, sortable time) from epoch seconds/milliseconds or ISO 8601 text.
+    try:
+        seconds = _epoch_seconds(value)
+        if seconds is not None:
+            moment = datetime.fromtimestamp(seconds, timezone.utc)
+        elif isinstance(value, str):
+            moment = datetime.fromisoformat(value.strip())
+        else:
+            raise InvalidReading("bad timestamp")
+        # moment.date() is the day in the export's own offset: the member's local day.
+        when = moment.timestamp() if moment.tzinfo else moment.replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidReading("bad timestamp") from None
+    return moment.date(), when
+
+def parse_record(record):
+    user_id = _field(record, USER_FIELDS)
+    stamp = _field(record, TIME_FIELDS)
+    if user_id is None or stamp is None:
+        raise InvalidReading("missing field")
+    weight = None
+    for name, factor in WEIGHT_FIELDS.items():
+        if record.get(name) not in (None, ""):
+            try:
+                weight = float(record[name]) * factor
+            except (TypeError, ValueError):
+                raise InvalidReading("bad weight") from None
+            break
+    if weight is None:
+        raise InvalidReading("missing field")
+    if not MIN_KG <= weight <= MAX_KG:
+        raise InvalidReading("weight out of range")
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        raise InvalidReading("bad user_id") from None
+    day, when = _moment(stamp)
+    return Reading(user_id, day, when, round(weight, 2))
+
+def open_export(path):
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    if path.endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+def export_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def records(text, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else {}
+
+def readings(text, fmt, rejected):
+    # Valid readings, in file order; rejects are counted by reason.
+    for record in records(text, fmt):
+        try:
+            yield parse_record(record)
+        except InvalidReading as error:
+            rejected[str(error)] += 1
+
+def batches(readings_, size=BATCH_ROWS):
+    batch = []
+    for reading in readings_:
+        batch.append(reading)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def first_of_day(batch):
+    # One reading per (user, day): the earliest, the first in the file on ties.
+    first = {}
+    for reading in batch:
+        key = (reading.user_id, reading.day)
+        kept = first.get(key)
+        if kept is None or reading.when < kept.when:
+            first[key] = reading
+    return sorted(first.values(), key=lambda r: (r.user_id, r.day))
+
+def write_shard(pool, batch):
+    # Adds one shard's readings; returns (entries added, days already
+    # recorded, unknown-user readings).
+    with pool.transaction() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS ingest_batch (user_id INTEGER, date TEXT, weight REAL, "
+                     "PRIMARY KEY (user_id, date)) WITHOUT ROWID")
+        conn.execute("DELETE FROM temp.ingest_batch")
+        conn.executemany("INSERT INTO temp.ingest_batch VALUES (?, ?, ?)",
+                         ((r.user_id, r.day.isoformat(), r.weight) for r in batch))
+        # New days of known members, each with the weight recorded before it.
+        rows = conn.execute("""
+            SELECT b.user_id, b.date, b.weight, i.Weight,
+                (SELECT p.date FROM progress p WHERE p.user_id = b.user_id AND p.date < b.date
+                    ORDER BY p.date DESC LIMIT 1),
+                (SELECT p.new_weight FROM progress p WHERE p.user_id = b.user_id AND p.date < b.date
+                    ORDER BY p.date DESC, p.progress_id DESC LIMIT 1)
+            FROM temp.ingest_batch b JOIN User_info i ON i.user_id = b.user_id
+            WHERE NOT EXISTS (SELECT 1 FROM progress p WHERE p.user_id = b.user_id AND p.date = b.date)
+            ORDER BY b.user_id, b.date
+        """).fetchall()
+        known = conn.execute("SELECT COUNT(*) FROM temp.ingest_batch b "
+                             "WHERE EXISTS (SELECT 1 FROM User_info i WHERE i.user_id = b.user_id)").fetchone()[0]
+
+        entries = []
+        previous_user = previous_date = previous_weight = None
+        for user_id, day, weight, current, stored_date, stored_weight in rows:
+            if user_id != previous_user:
+                previous_user, previous_date, previous_weight = user_id, None, None
+            # Whichever came last before this day: a stored entry or this batch's previous reading.
+            if stored_date is not None and (previous_date is None or stored_date > previous_date):
+                before = stored_weight
+            elif previous_date is not None:
+                before = previous_weight
+            else:
+                before = current
+            entries.append((user_id, before, weight, date.fromisoformat(day)))
+            previous_date, previous_weight = day, weight
+
+        if entries:
+            user_ids = sorted({entry[0] for entry in entries})
+            last_dates = dict(conn.execute(
+                "SELECT user_id, last_date FROM progress_summary "
+                "WHERE user_id IN (SELECT DISTINCT user_id FROM temp.ingest_batch)"
+            ).fetchall())
+            # Entries are in (user, date) order, so this keeps each member's newest reading.
+            newest = {user_id: (day.isoformat(), weight) for user_id, _, weight, day in entries}
+            cohort_analytics.retract(conn, user_ids, [cohort_analytics.OUTCOME])
+            progress_store.apply_entries(conn, entries)
+            # Weight only moves to a reading on or after the member's latest
+            # recorded day: a backfill of older days must not replace it,
+            # since it may have been set through the form since then.
+            conn.executemany("UPDATE User_info SET Weight = ? WHERE user_id = ?", (
+                (weight, user_id) for user_id, (day, weight) in newest.items()
+                if last_dates.get(user_id) is None or day >= last_dates[user_id]
+            ))
+            cohort_analytics.contribute(conn, user_ids, [cohort_analytics.OUTCOME])
+    return len(entries), known - len(entries), len(batch) - known
+
+def write_batch(batch):
+    # Split with the same user_id % shards rule as db.ShardRouter; one
+    # transaction per shard, all shards at once.
+    pools = db.user_pools()
+    shard = np.fromiter((r.user_id for r in batch), dtype=np.int64, count=len(batch)) % len(pools)
+    parts = [(pool, [batch[j] for j in np.flatnonzero(shard == i)]) for i, pool in enumerate(pools)]
+    results = db.fan_out(lambda part: write_shard(*part), [part for part in parts if part[1]])
+    return [sum(column) for column in zip(*results)] if results else [0, 0, 0]
+
+def ingest(path, fmt=None, batch_rows=BATCH_ROWS, log=sys.stderr):
+    fmt = fmt or export_format(path)
+    counts = Counter()
+    rejected = Counter()
+    start = time.perf_counter()
+    with open_export(path) as text:
+        for batch in batches(readings(text, fmt, rejected), batch_rows):
+            batch_start = time.perf_counter()
+            daily = first_of_day(batch)
+            added, recorded, unknown = write_batch(daily)
+            counts.update(readings=len(batch), added=added, already_recorded=recorded,
+                          unknown_user=unknown, same_day=len(batch) - len(daily))
+            elapsed = time.perf_counter() - batch_start
+            print(f"{counts['readings']} readings, {counts['added']} added "
+                  f"({len(batch) / elapsed:,.0f} rows/s this batch)", file=log)
+
+    elapsed = time.perf_counter() - start
+    rows = counts["readings"] + sum(rejected.values())
+    return {
+        "rows": rows,
+        **{key: counts[key] for key in ("readings", "added", "same_day", "already_recorded", "unknown_user")},
+        "rejected": dict(rejected),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Import weigh-ins from smart-scale/wearable exports into progress.")
+    parser.add_argument("export", help="CSV or JSONL file, optionally .gz; - reads stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file name")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--shards", default=db.SHARDS_PATH, help="shard manifest (default: $FITNESS_SHARDS, else shards.json next to --db)")
+    args = parser.parse_args()
+
+    db.configure(args.db, shards=args.shards)
+    print(json.dumps(ingest(args.export, args.format, args.batch_rows), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks import _run_metadata, percentiles
+
+# Simulated members, end to end: sign up, log in, submit the form, view the
+# plan, then a run of weight updates, each followed by the progress page's
+# reads. Runs offline against a scratch copy of the database, at one or more
+# concurrency levels, to find where a replica's latency or SQLite locking
+# gives out.
+#
+#   direct   calls what the pages call (authentication, plan_client,
+#            progress_store, charts) from worker threads
+#   apptest  drives app.py itself through streamlit.testing's AppTest, one
+#            app session per simulated member, in worker processes
+
+DB_PATH = "database/FitnessCoach.db"
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+LOCK_MARKERS = ("database is locked", "database table is locked", "no free connection")
+APPTEST_TIMEOUT = 120
+PASSWORD = "load-test"
+
+class FlowError(Exception):
+    pass
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = Counter()
+        self.lock_errors = 0
+        self.flows = 0
+        self.failed_flows = 0
+
+    def step(self, name, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as error:
+            self.error(name, error)
+            raise FlowError(name) from error
+        with self._lock:
+            self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1e3)
+        return result
+
+    def error(self, step, error):
+        message = str(error)
+        with self._lock:
+            self.errors[f"{step}: {type(error).__name__}"] += 1
+            if any(marker in message.lower() for marker in LOCK_MARKERS):
+                self.lock_errors += 1
+
+    def flow_done(self, ok):
+        with self._lock:
+            self.flows += 1
+            self.failed_flows += not ok
+
+    def export(self):
+        with self._lock:
+            return {"samples": self.samples, "errors": dict(self.errors), "lock_errors": self.lock_errors,
+                    "flows": self.flows, "failed_flows": self.failed_flows}
+
+    def merge(self, exported):
+        with self._lock:
+            for name, values in exported["samples"].items():
+                self.samples.setdefault(name, []).extend(values)
+            self.errors.update(exported["errors"])
+            self.lock_errors += exported["lock_errors"]
+            self.flows += exported["flows"]
+            self.failed_flows += exported["failed_flows"]
+
+def member_profile(rng):
+    height = rng.randint(150, 195)
+    return {
+        "Age": rng.randint(20, 70),
+        "Gender": rng.choice(["Male", "Female"]),
+        "Weight": rng.randint(50, 120),
+        "height": height,
+        "Fitness Goal": rng.choice(["Weight Gain", "Weight Loss"]),
+        "Fitness Type": rng.choice(["Cardio Fitness", "Muscular Fitness"]),
+        "Disease_Type": rng.choice(["None", "Diabetes", "Hypertension", "Obesity"]),
+        "Severity": rng.choice(["Mild", "Moderate", "Severe"]),
+        "Physical_Activity_Level": rng.choice(["Sedentary", "Moderate", "Active"]),
+        "Daily_Caloric_Intake": rng.randint(1500, 3500),
+        "Cholesterol": rng.randint(150, 250),
+        "Blood_Pressure": rng.randint(100, 170),
+        "Glucose": rng.randint(70, 180),
+        "Dietary_Restrictions": rng.choice(["None", "Low Sodium", "Low Sugar"]),
+        "Allergies": rng.choice(["None", "Gluten", "Peanuts"]),
+        "Preferred_Cuisine": rng.choice(["Chinese", "Indian", "Italian", "Mexican"]),
+        "Weekly_Exercise_Hours": rng.randint(0, 10),
+        "Adherence_to_Diet_Plan": rng.randint(40, 100),
+        "Dietary_Nutrient_Imbalance_Score": rng.randint(0, 5),
+    }
+
+def weight_updates(rng, weight, updates):
+    day = date(2026, 1, 1)
+    for _ in range(updates):
+        weight = max(40, weight + rng.choice([-2, -1, -1, 0, 1]))
+        yield weight, day
+        day += timedelta(days=7)
+
+# -- direct driver ---------------------------------------------------------
+
+# signup_user/login_user report the user through st.session_state, which is
+# one shared object outside a Streamlit session; this keeps each call and
+# the read of its result together.
+_session_lock = threading.Lock()
+
+def _signup(name, username):
+    import streamlit as st
+    from authentication import signup_user
+    with _session_lock:
+        ok, message = signup_user(name, username, PASSWORD)
+        if not ok:
+            raise FlowError(message)
+        return st.session_state.user_id
+
+def _login(username):
+    import streamlit as st
+    from authentication import has_plan, login_user
+    with _session_lock:
+        if not login_user(username, PASSWORD):
+            raise FlowError("login failed")
+        user_id = st.session_state.user_id
+    return user_id, has_plan(user_id)
+
+def _render_plan(user_id):
+    # fitness_plan(): the stored recommendation, decoded.
+    from plan_client import get_client
+    from plan_decoder import diet_label, gym_plan
+    plan = get_client().get_plan(user_id)
+    return gym_plan(plan["gym_rec"]), diet_label(plan["diet_rec"])
+
+def _render_progress(user_id):
+    # progress_tracking(): profile row, summary, trend, history and chart.
+    from charts import show_weight_chart
+    from db import fetch_one
+    from progress_store import get_summary, latest_means, recent_entries, trend_per_day, weight_timeline
+    fetch_one("SELECT height, Weight, \"Fitness Goal\" FROM User_info WHERE user_id = ?", (user_id,), user_id=user_id)
+    summary = get_summary(user_id)
+    if summary is None:
+        return
+    if trend_per_day(summary) is not None:
+        latest_means(user_id)
+    recent_entries(user_id)
+    timeline = weight_timeline(user_id, summary.version)
+    show_weight_chart(timeline, (user_id, summary.version))
+
+def direct_flow(number, rng, updates, recorder):
+    from plan_client import get_client
+    username = f"load-{uuid.uuid4().hex[:12]}"
+    profile = member_profile(rng)
+    recorder.step("signup", _signup, f"Load Member {number}", username)
+    user_id, _ = recorder.step("login", _login, username)
+    recorder.step("submit_form", get_client().create_plan, user_id, profile)
+    recorder.step("render_plan", _render_plan, user_id)
+    recorder.step("render_progress", _render_progress, user_id)
+    previous = profile["Weight"]
+    for weight, day in weight_updates(rng, previous, updates):
+        recorder.step("record_weight", get_client().record_weight, user_id, previous, weight, day)
+        recorder.step("render_progress", _render_progress, user_id)
+        previous = weight
+
+# -- AppTest driver ----------------------------------------------------------
+
+def _check(at, step, recorder):
+    for exception in at.exception:
+        recorder.error(step, RuntimeError(exception.message))
+    if len(at.exception):
+        raise FlowError(step)
+
+def _run(at, step, recorder, action=None):
+    def go():
+        (action() if action else at).run(timeout=APPTEST_TIMEOUT)
+    recorder.step(step, go)
+    _check(at, step, recorder)
+
+def _button(at, label):
+    for button in at.button:
+        if label in button.label:
+            return button
+    raise FlowError(f"no {label!r} button")
+
+def apptest_flow(number, rng, updates, recorder):
+    from streamlit.testing.v1 import AppTest
+    username = f"load-{uuid.uuid4().hex[:12]}"
+    profile = member_profile(rng)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=APPTEST_TIMEOUT)
+    _run(at, "open", recorder)
+    at.text_input(key="signup_name").set_value(f"Load Member {number}")
+    at.text_input(key="signup_username").set_value(username)
+    at.text_input(key="signup_password").set_value(PASSWORD)
+    _run(at, "signup", recorder, _button(at, "Sign Up").click)
+
+    at.number_input[0].set_value(profile["Age"])
+    at.number_input[1].set_value(profile["Weight"])
+    at.number_input[2].set_value(profile["height"])
+    _run(at, "submit_form", recorder, _button(at, "Generate").click)
+
+    for weight, day in weight_updates(rng, profile["Weight"], updates):
+        at.number_input[0].set_value(weight)
+        at.date_input[0].set_value(day)
+        _run(at, "record_weight", recorder, _button(at, "Update").click)
+
+    # A returning member: fresh session, log in, land on the plan page.
+    at = AppTest.from_file(APP_PATH, default_timeout=APPTEST_TIMEOUT)
+    _run(at, "open", recorder)
+    at.text_input(key="login_username").set_value(username)
+    at.text_input(key="login_password").set_value(PASSWORD)
+    _run(at, "login", recorder, _button(at, "Log In").click)
+
+DRIVERS = {"direct": direct_flow, "apptest": apptest_flow}
+
+# -- runner ----------------------------------------------------------------
+
+def run_member(flow, number, seed, updates, recorder):
+    try:
+        flow(number, random.Random(seed * 1_000_003 + number), updates, recorder)
+    except FlowError:
+        recorder.flow_done(False)
+    except Exception as error:
+        recorder.error("flow", error)
+        recorder.flow_done(False)
+    else:
+        recorder.flow_done(True)
+
+def _init_worker(path, manifest):
+    import db
+    import planner
+    db.configure(path, shards=manifest)
+    planner.warm_up()
+
+def _apptest_member(number, seed, updates):
+    from model_registry import _rss_bytes
+    recorder = Recorder()
+    rss_before = _rss_bytes()
+    run_member(apptest_flow, number, seed, updates, recorder)
+    return recorder.export(), max(_rss_bytes() - rss_before, 0)
+
+def run_level(driver, sessions, concurrency, updates, seed, path, manifest=None):
+    from model_registry import _rss_bytes
+    recorder = Recorder()
+    start = time.perf_counter()
+    if driver == "direct":
+        # One process, one thread per member: the way Streamlit runs sessions.
+        rss_before = _rss_bytes()
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="member") as pool:
+            list(pool.map(lambda n: run_member(direct_flow, n, seed, updates, recorder), range(sessions)))
+        rss_growth = max(_rss_bytes() - rss_before, 0)
+    else:
+        # AppTest keeps one runtime per process, so concurrent members each
+        # need their own process; they still share the one database file.
+        # Imported by name: AppTest runs app.py as __main__ in the workers,
+        # so functions pickled as __main__.* would not resolve there.
+        from loadtest import _apptest_member, _init_worker
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(concurrency, mp_context=context, initializer=_init_worker, initargs=(path, manifest)) as pool:
+            # Workers start (and load the models) before the clock does.
+            list(pool.map(time.sleep, [0.1] * concurrency))
+            start = time.perf_counter()
+            futures = [pool.submit(_apptest_member, n, seed, updates) for n in range(sessions)]
+            rss_growth = 0
+            for future in futures:
+                exported, member_rss = future.result()
+                recorder.merge(exported)
+                rss_growth += member_rss
+    wall = time.perf_counter() - start
+
+    steps = sum(len(v) for v in recorder.samples.values())
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "wall_seconds": round(wall, 3),
+        "flows_per_second": round(recorder.flows / wall, 3),
+        "steps_per_second": round(steps / wall, 2),
+        "failed_flows": recorder.failed_flows,
+        "lock_errors": recorder.lock_errors,
+        "errors": dict(recorder.errors),
+        "latency_ms": {name: {k: round(v, 2) if isinstance(v, float) else v for k, v in percentiles(values).items()}
+                       for name, values in recorder.samples.items()},
+        "rss_growth_bytes": rss_growth,
+        "rss_growth_per_session_bytes": rss_growth // max(sessions, 1),
+    }
+
+def run_load_test(driver="direct", sessions=50, concurrency=(1, 4, 16), updates=5, source=DB_PATH,
+                  warm_up=True, seed=0, keep_dir=None, shards=0):
+    import db
+    import planner
+
+    workdir = keep_dir or tempfile.mkdtemp(prefix="fitness-load-")
+    try:
+        # Every write goes to this copy; the real database is never touched.
+        path = os.path.join(workdir, "loadtest.db")
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        manifest = None
+        if shards:
+            import shards as shard_tool
+            manifest = os.path.join(workdir, "shards.json")
+            shard_tool.split(path, shards, manifest, log=io.StringIO())
+        db.configure(path, shards=manifest)
+
+        warm_up_seconds = None
+        if warm_up:
+            start = time.perf_counter()
+            planner.warm_up()
+            warm_up_seconds = round(time.perf_counter() - start, 3)
+
+        levels = [run_level(driver, sessions, c, updates, seed + i, path, manifest) for i, c in enumerate(concurrency)]
+        result = {
+            "meta": _run_metadata(),
+            "params": {"driver": driver, "sessions": sessions, "concurrency": list(concurrency),
+                       "updates": updates, "db_pool_size": db.pool.size, "seed": seed, "shards": shards},
+            "warm_up_seconds": warm_up_seconds,
+            "levels": levels,
+        }
+        db.close()
+        return result
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent members against a scratch copy of the database.")
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="direct")
+    parser.add_argument("--sessions", type=int, default=50, help="members simulated at each concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--updates", type=int, default=5, help="weight updates per member")
+    parser.add_argument("--db", default=DB_PATH, help="database to copy (never written)")
+    parser.add_argument("--no-warm-up", action="store_true", help="let the first members pay for model loading")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=0, help="split the copy into this many shards first")
+    parser.add_argument("--output", help="write the JSON here as well as printing it")
+    parser.add_argument("--keep-dir", help="keep the scratch database here")
+    args = parser.parse_args()
+
+    result = run_load_test(args.driver, args.sessions, args.concurrency, args.updates, args.db,
+                           not args.no_warm_up, args.seed, args.keep_dir, args.shards)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import sqlite3
+
+# Each migration runs once, in order, inside one transaction; the schema
+# version lives in PRAGMA user_version.
+
+def run_script(conn, script):
+    # Not executescript(): that commits first and would split the migration
+    # out of its transaction.
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+def plan_one_per_user(conn):
+    # Keep the newest plan of anyone who has several, type user_id, and let
+    # the unique constraint stop duplicates from coming back. Its index also
+    # serves has_plan and get_rec_from_db.
+    run_script(conn, """
+        CREATE TABLE plan_new (
+            "plan_id"	INTEGER,
+            "user_id"	INTEGER NOT NULL UNIQUE,
+            "gym_rec"	INTEGER,
+            "diet_rec"	INTEGER,
+            PRIMARY KEY("plan_id" AUTOINCREMENT),
+            FOREIGN KEY("user_id") REFERENCES "User_info"("user_id") ON DELETE CASCADE ON UPDATE CASCADE
+        );
+        INSERT INTO plan_new (plan_id, user_id, gym_rec, diet_rec)
+            SELECT plan_id, CAST(user_id AS INTEGER), gym_rec, diet_rec FROM plan
+            WHERE plan_id IN (SELECT MAX(plan_id) FROM plan GROUP BY CAST(user_id AS INTEGER));
+        DROP TABLE plan;
+        ALTER TABLE plan_new RENAME TO plan;
+    """)
+
+def progress_iso_dates(conn):
+    # "%d-%m-%Y" text does not sort by date; ISO 8601 does, and range scans work.
+    run_script(conn, """
+        UPDATE progress
+            SET date = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+            WHERE date LIKE '__-__-____';
+        CREATE INDEX progress_user_date ON progress (user_id, date, previous_weight, new_weight);
+    """)
+
+def progress_summaries(conn):
+    # One summary row per user plus weekly/monthly buckets, kept current by
+    # progress_store.record_weight. x is days since 2020-01-01 so the
+    # regression sums stay small.
+    run_script(conn, """
+        CREATE TABLE progress_summary (
+            "user_id"	INTEGER,
+            "entries"	INTEGER NOT NULL,
+            "version"	INTEGER NOT NULL,
+            "start_date"	TEXT,
+            "start_weight"	REAL,
+            "last_date"	TEXT,
+            "last_weight"	REAL,
+            "sum_x"	REAL NOT NULL,
+            "sum_y"	REAL NOT NULL,
+            "sum_xx"	REAL NOT NULL,
+            "sum_xy"	REAL NOT NULL,
+            PRIMARY KEY("user_id")
+        );
+        CREATE TABLE progress_rollup (
+            "user_id"	INTEGER NOT NULL,
+            "period"	TEXT NOT NULL,
+            "bucket"	TEXT NOT NULL,
+            "entries"	INTEGER NOT NULL,
+            "weight_sum"	REAL NOT NULL,
+            "min_weight"	REAL,
+            "max_weight"	REAL,
+            PRIMARY KEY("user_id", "period", "bucket")
+        ) WITHOUT ROWID;
+        INSERT INTO progress_summary
+            SELECT user_id, COUNT(*), COUNT(*),
+                MIN(date),
+                (SELECT previous_weight FROM progress f WHERE f.user_id = p.user_id ORDER BY date, progress_id LIMIT 1),
+                MAX(date),
+                (SELECT new_weight FROM progress l WHERE l.user_id = p.user_id ORDER BY date DESC, progress_id DESC LIMIT 1),
+                SUM(x), SUM(new_weight), SUM(x * x), SUM(x * new_weight)
+            FROM (SELECT *, julianday(date) - julianday('2020-01-01') AS x FROM progress) p
+            GROUP BY user_id;
+        INSERT INTO progress_rollup
+            SELECT user_id, 'week', date(date, 'weekday 0', '-6 days'), COUNT(*), SUM(new_weight), MIN(new_weight), MAX(new_weight)
+            FROM progress GROUP BY 1, 3;
+        INSERT INTO progress_rollup
+            SELECT user_id, 'month', strftime('%Y-%m-01', date), COUNT(*), SUM(new_weight), MIN(new_weight), MAX(new_weight)
+            FROM progress GROUP BY 1, 3;
+    """)
+
+def cohort_rollups(conn):
+    # Coach dashboard rollups, kept current by cohort_analytics from
+    # progress_store.apply_entry and planner.save_plan. A tracked user counts
+    # once in cohort_outcome, under their goal, BMI level, adherence decile
+    # and weight change rounded to the kilogram (clamped to +-30).
+    run_script(conn, """
+        CREATE TABLE cohort_outcome (
+            "fitness_goal"	TEXT NOT NULL,
+            "level"	TEXT NOT NULL,
+            "adherence_bin"	INTEGER NOT NULL,
+            "change_bin"	INTEGER NOT NULL,
+            "users"	INTEGER NOT NULL,
+            "change_sum"	REAL NOT NULL,
+            PRIMARY KEY("fitness_goal", "level", "adherence_bin", "change_bin")
+        ) WITHOUT ROWID;
+        CREATE TABLE cohort_plans (
+            "level"	TEXT NOT NULL,
+            "gym_rec"	INTEGER NOT NULL,
+            "diet_rec"	INTEGER NOT NULL,
+            "users"	INTEGER NOT NULL,
+            PRIMARY KEY("level", "gym_rec", "diet_rec")
+        ) WITHOUT ROWID;
+        INSERT INTO cohort_outcome
+            SELECT COALESCE(i."Fitness Goal", 'Unknown'), COALESCE(i.level, 'Unknown'),
+                COALESCE(CAST(MIN(MAX(i.Adherence_to_Diet_Plan, 0), 99.999) / 10 AS INTEGER), -1),
+                MAX(MIN(CAST(ROUND(s.last_weight - s.start_weight) AS INTEGER), 30), -30),
+                COUNT(*), SUM(s.last_weight - s.start_weight)
+            FROM progress_summary s LEFT JOIN User_info i ON i.user_id = s.user_id
+            GROUP BY 1, 2, 3, 4;
+        INSERT INTO cohort_plans
+            SELECT COALESCE(i.level, 'Unknown'), COALESCE(p.gym_rec, -1), COALESCE(p.diet_rec, -1), COUNT(*)
+            FROM plan p LEFT JOIN User_info i ON i.user_id = p.user_id
+            GROUP BY 1, 2, 3;
+    """)
+
+# Columns the Database page can sort by, beyond rowids and columns that
+# already lead an index. Kept short: every index is maintained on each
+# signup, form save, weight update and import.
+SORT_INDEXES = {
+    "User": ["Name"],
+    "User_info": ["Age", "Weight", "BMI"],
+    "plan": ["gym_rec", "diet_rec"],
+    "progress": ["date", "new_weight"],
+}
+
+def sort_indexes(conn):
+    # The Database page orders by the bare column with rowid as tie-break;
+    # an index on the column serves both the ORDER BY and the keyset seek.
+    for table, columns in SORT_INDEXES.items():
+        for column in columns:
+            conn.execute(f'CREATE INDEX "{table}_sort_{column}" ON "{table}" ("{column}")')
+
+MIGRATIONS = [
+    (1, plan_one_per_user),
+    (2, progress_iso_dates),
+    (3, progress_summaries),
+    (4, cohort_rollups),
+    (5, sort_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target=LATEST_VERSION):
+    if schema_version(conn) >= target:
+        return []
+
+    applied = []
+    # BEGIN IMMEDIATE takes the write lock, so concurrent processes migrate once.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = schema_version(conn)
+        for number, migration in MIGRATIONS:
+            if version < number <= target:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                applied.append(migration.__name__)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply FitnessCoach.db schema migrations.")
+    parser.add_argument("--db", default="database/FitnessCoach.db")
+    parser.add_argument("--target", type=int, default=LATEST_VERSION)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        applied = migrate(conn, args.target)
+        print(f"Schema at version {schema_version(conn)}; applied: {', '.join(applied) or 'nothing'}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+from tracing import span
+
+MODEL_PATHS = {
+    "gym": "models/gym_model.pkl",
+    "diet": "models/diet_model.pkl",
+    "gym_encoders": "encoders/gym_encoders.pkl",
+    "diet_encoders": "encoders/diet_encoders.pkl",
+}
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class _Entry:
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.obj = None
+        self.stat = None
+        self.sha256 = None
+        self.hashed_stat = None
+        self.hashed_sha256 = None
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.loads = 0
+        self.loaded_at = None
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ModelRegistry:
+    def __init__(self, paths, loader=joblib.load):
+        self.loader = loader
+        self._entries = {name: _Entry(path, loader) for name, path in paths.items()}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, loader=None):
+        loader = loader or self.loader
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.path != path or entry.loader is not loader:
+                self._entries[name] = _Entry(path, loader)
+
+    def exists(self, name):
+        return os.path.exists(self._entries[name].path)
+
+    def fingerprint(self, name):
+        # Content hash of the artifact without loading it; rehashed only
+        # when mtime or size change.
+        entry = self._entries[name]
+        key = _stat_key(entry.path)
+        if entry.hashed_stat != key:
+            entry.hashed_sha256 = file_hash(entry.path)
+            entry.hashed_stat = key
+        return entry.hashed_sha256
+
+    def get(self, name):
+        entry = self._entries[name]
+        key = _stat_key(entry.path)
+        if entry.obj is not None and entry.stat == key:
+            return entry.obj
+
+        with entry.lock:
+            # Another session may have finished the (re)load while we waited.
+            key = _stat_key(entry.path)
+            if entry.obj is not None and entry.stat == key:
+                return entry.obj
+
+            sha256 = self.fingerprint(name)
+            if entry.obj is not None and sha256 == entry.sha256:
+                # Touched but not modified: keep the loaded object.
+                entry.stat = key
+                return entry.obj
+
+            entry.obj, entry.load_seconds, entry.memory_bytes = self._load(entry)
+            entry.sha256 = sha256
+            entry.stat = key
+            entry.loads += 1
+            entry.loaded_at = time.time()
+            return entry.obj
+
+    def version(self, name):
+        return self.fingerprint(name)
+
+    def _load(self, entry):
+        # RSS delta rather than tracemalloc: tree arrays are allocated outside
+        # the Python allocator and tracing slows the unpickle down badly.
+        before = _rss_bytes()
+        start = time.perf_counter()
+        with span("model.load", path=entry.path):
+            obj = entry.loader(entry.path)
+        elapsed = time.perf_counter() - start
+        return obj, elapsed, max(_rss_bytes() - before, 0)
+
+    def stats(self):
+        return {
+            name: {
+                "path": entry.path,
+                "loaded": entry.obj is not None,
+                "sha256": entry.sha256,
+                "loads": entry.loads,
+                "load_seconds": entry.load_seconds,
+                "memory_bytes": entry.memory_bytes,
+                "loaded_at": entry.loaded_at,
+            }
+            for name, entry in self._entries.items()
+        }
+
+registry = ModelRegistry(MODEL_PATHS)
+
+def get_model(name):
+    return registry.get(name)
+
+def model_version(name):
+    return registry.version(name)
+
+def registry_stats():
+    return registry.stats()
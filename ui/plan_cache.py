@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from model_registry import registry
+from tracing import count
+
+# (model version, encoded features) -> (gym_rec, diet_rec). Form inputs are
+# coarse, so many profiles encode to the same feature rows; those skip
+# inference. The key is the raw float32 bytes of the gym and diet rows. The
+# decoded plan is a per-class table lookup in plan_decoder, so only the class
+# ids are stored.
+#
+# Entries live in a per-process LRU with a TTL; FITNESS_PLAN_CACHE_DB adds a
+# SQLite tier shared by every process pointed at the same file (service
+# workers, batch jobs, Streamlit). Both tiers drop everything when any of
+# ARTIFACTS changes.
+
+CACHE_SIZE = int(os.environ.get("FITNESS_PLAN_CACHE_SIZE", "65536"))
+TTL_SECONDS = float(os.environ.get("FITNESS_PLAN_CACHE_TTL", str(24 * 3600)))
+SHARED_PATH = os.environ.get("FITNESS_PLAN_CACHE_DB", "")
+ARTIFACTS = ["gym", "diet", "gym_encoders", "diet_encoders"]
+# Keeps the IN (...) list under SQLite's bound-parameter limit.
+SHARED_CHUNK = 500
+
+def model_version():
+    digest = hashlib.sha256("|".join(registry.fingerprint(name) for name in ARTIFACTS).encode("ascii"))
+    return digest.hexdigest()[:16]
+
+def row_keys(*matrices):
+    # Distinct feature-row keys, the first row of each, and the row -> key index.
+    X = np.ascontiguousarray(np.hstack(matrices), dtype=np.float32)
+    rows = X.view(np.dtype((np.void, X.shape[1] * X.itemsize))).ravel()
+    if len(rows) == 1:
+        return [rows[0].tobytes()], np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    unique, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return [key.tobytes() for key in unique], first, inverse.ravel()
+
+class SharedTier:
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS plan_cache ("
+        "key BLOB PRIMARY KEY, version TEXT NOT NULL, gym_rec INTEGER NOT NULL, "
+        "diet_rec INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys, version, now):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SHARED_CHUNK):
+                chunk = keys[i:i + SHARED_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT key, gym_rec, diet_rec FROM plan_cache WHERE version = ? AND expires_at > ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    [version, now, *chunk],
+                ).fetchall()
+                found.update((key, (gym_rec, diet_rec)) for key, gym_rec, diet_rec in rows)
+        return found
+
+    def put_many(self, items, version, expires_at):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO plan_cache (key, version, gym_rec, diet_rec, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, version, gym_rec, diet_rec, expires_at) for key, (gym_rec, diet_rec) in items],
+            )
+            self._conn.execute("COMMIT")
+
+    def prune(self, version, now):
+        # Entries from other model versions can never hit again.
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM plan_cache WHERE version != ? OR expires_at <= ?", (version, now)
+            ).rowcount
+
+    def clear(self):
+        with self._lock:
+            return self._conn.execute("DELETE FROM plan_cache").rowcount
+
+    def stats(self):
+        with self._lock:
+            rows, versions = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT version) FROM plan_cache").fetchone()
+        return {"path": self.path, "rows": rows, "versions": versions}
+
+    def close(self):
+        self._conn.close()
+
+class PlanCache:
+    def __init__(self, size=CACHE_SIZE, ttl=TTL_SECONDS, shared_path=SHARED_PATH):
+        self.size = size
+        self.ttl = ttl
+        self.shared = SharedTier(shared_path) if shared_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._counts = dict.fromkeys(
+            ["lookups", "hits", "shared_hits", "misses", "expired", "evictions", "invalidations"], 0
+        )
+
+    @property
+    def enabled(self):
+        return self.size > 0 or self.shared is not None
+
+    def _check_version(self, now):
+        version = model_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self._counts["invalidations"] += 1
+                    self._entries.clear()
+                    self._version = version
+            if self.shared is not None:
+                self.shared.prune(version, now)
+        return version
+
+    def get_many(self, keys):
+        # One (gym_rec, diet_rec) or None per key.
+        now = time.time()
+        version = self._check_version(now)
+        results = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.append(i)
+                elif entry[0] <= now:
+                    del self._entries[key]
+                    self._counts["expired"] += 1
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    results[i] = entry[1]
+        hits = len(keys) - len(missing)
+
+        shared_hits = 0
+        if missing and self.shared is not None:
+            found = self.shared.get_many([keys[i] for i in missing], version, now)
+            if found:
+                # Promoted with a fresh local TTL; the shared row keeps its own.
+                self._remember(found.items(), now)
+                for i in missing:
+                    results[i] = found.get(keys[i])
+                shared_hits = len(found)
+
+        misses = len(missing) - shared_hits
+        with self._lock:
+            self._counts["lookups"] += len(keys)
+            self._counts["hits"] += hits
+            self._counts["shared_hits"] += shared_hits
+            self._counts["misses"] += misses
+        count("plan_cache.hits", hits + shared_hits)
+        count("plan_cache.misses", misses)
+        return results
+
+    def put_many(self, items):
+        items = list(items)
+        now = time.time()
+        self._remember(items, now)
+        if self.shared is not None and items:
+            self.shared.put_many(items, self._version, now + self.ttl)
+
+    def _remember(self, items, now):
+        if self.size <= 0:
+            return
+        expires_at = now + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        lookups = counts["lookups"]
+        return {
+            "pid": os.getpid(),
+            "version": self._version,
+            "size": self.size,
+            "ttl_seconds": self.ttl,
+            "entries": entries,
+            **counts,
+            "hit_ratio": round((counts["hits"] + counts["shared_hits"]) / lookups, 4) if lookups else None,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+cache = PlanCache()
+
+def cached_predict(gym_X, diet_X, predict):
+    # Plans for encoded feature rows, calling predict(gym_rows, diet_rows)
+    # only for rows not cached; identical rows within one call are predicted once.
+    if not cache.enabled:
+        gym, diet = predict(gym_X, diet_X)
+        return np.asarray(gym, dtype=np.int64), np.asarray(diet, dtype=np.int64)
+
+    keys, first, inverse = row_keys(gym_X, diet_X)
+    found = cache.get_many(keys)
+    gym = np.empty(len(keys), dtype=np.int64)
+    diet = np.empty(len(keys), dtype=np.int64)
+    missing = []
+    for i, value in enumerate(found):
+        if value is None:
+            missing.append(i)
+        else:
+            gym[i], diet[i] = value
+    if missing:
+        rows = first[missing]
+        gym[missing], diet[missing] = predict(gym_X[rows], diet_X[rows])
+        cache.put_many((keys[i], (int(gym[i]), int(diet[i]))) for i in missing)
+    return gym[inverse], diet[inverse]
+
+def stats():
+    return cache.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared plan-result cache.")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--db", default=SHARED_PATH or None, required=not SHARED_PATH,
+                        help="shared cache file (default: $FITNESS_PLAN_CACHE_DB)")
+    args = parser.parse_args()
+
+    shared = SharedTier(args.db)
+    if args.command == "stats":
+        result = shared.stats()
+    elif args.command == "prune":
+        result = {"deleted": shared.prune(model_version(), time.time())}
+    else:
+        result = {"deleted": shared.clear()}
+    shared.close()
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
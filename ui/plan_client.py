@@ -0,0 +1,84 @@
+import json
+import os
+import urllib.error
+import urllib.request
+from datetime import date
+
+import planner
+import progress_store
+
+# Unset: the UI runs inference and writes in-process. Set to the service's
+# base URL (e.g. http://localhost:8000) to use it instead.
+SERVICE_URL = os.environ.get("FITNESS_SERVICE_URL")
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+class LocalClient:
+    def create_plan(self, user_id, profile):
+        return planner.create_plan(user_id, profile)
+
+    def predict_plans(self, profiles):
+        return planner.predict_plans(profiles)
+
+    def get_plan(self, user_id):
+        return planner.get_plan(user_id)
+
+    def record_weight(self, user_id, previous_weight, new_weight, day):
+        progress_store.record_weight(user_id, previous_weight, new_weight, day)
+
+class HttpClient:
+    def __init__(self, base_url, timeout=10.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as error:
+            body = error.read().decode("utf-8", "replace")
+            try:
+                message = json.loads(body).get("error", body)
+            except ValueError:
+                message = body
+            raise ServiceError(error.code, message) from None
+
+    def create_plan(self, user_id, profile):
+        result = self._request("POST", "/plans", {"user_id": user_id, "profile": profile})
+        return result["gym_rec"], result["diet_rec"]
+
+    def predict_plans(self, profiles):
+        result = self._request("POST", "/predict", {"profiles": profiles})
+        return [(p["gym_rec"], p["diet_rec"]) for p in result["predictions"]]
+
+    def get_plan(self, user_id):
+        try:
+            return self._request("GET", f"/plans/{int(user_id)}")
+        except ServiceError as error:
+            if error.status == 404:
+                return None
+            raise
+
+    def record_weight(self, user_id, previous_weight, new_weight, day):
+        self._request("POST", "/progress", {
+            "user_id": user_id,
+            "previous_weight": previous_weight,
+            "new_weight": new_weight,
+            "date": day.isoformat() if isinstance(day, date) else day,
+        })
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = HttpClient(SERVICE_URL) if SERVICE_URL else LocalClient()
+    return _client
@@ -0,0 +1,104 @@
+import threading
+from collections import namedtuple
+
+from model_registry import get_model, model_version
+
+GymPlan = namedtuple("GymPlan", [
+    "exercises", "diet", "equipment", "recommendation",
+    "exercises_md", "diet_md", "equipment_md", "recommendation_md",
+])
+
+def recommendations(text):
+    text = text.strip()
+
+    if "Here are some important tips:-" in text:
+        intro, tips = text.split("Here are some important tips:-", 1)
+        intro = intro.strip()
+        tips = tips.strip()
+
+        intro_lines = [line.strip() for line in intro.split('.') if line.strip()]
+        intro_bullets = [f"- {line}." for line in intro_lines]
+
+        tips_lines = [line.strip() for line in tips.replace("\n", ".").split('.') if line.strip()]
+        tips_bullets = [f"- {line}." for line in tips_lines]
+
+        full_text = "\n".join(intro_bullets) + "\n\n**Here are some important tips:**\n" + "\n".join(tips_bullets)
+    else:
+        lines = [line.strip() for line in text.split('.') if line.strip()]
+        full_text = "\n".join(f"- {line}." for line in lines)
+
+    return full_text
+
+def bullet_points(text):
+    text = text.replace(", and ", ", ")
+    text = text.replace(" and ", ", ")
+
+    items = [item.strip().capitalize() for item in text.split(",") if item.strip()]
+    
+    return "\n".join(f"- {item}" for item in items)
+
+def diet_section(diet_text):   
+    sections = [section.strip() for section in diet_text.split(";") if section.strip()]
+    
+    emojis = {
+        "Vegetables": "🥕",
+        "Protein Intake": "🍗",
+        "Juice": "🍹"
+    }
+    
+    formatted = []
+    for section in sections:
+        if ":" in section:
+            key, value = section.split(":", 1)
+            key = key.strip()
+            value = value.strip().strip("()")
+            emoji = emojis.get(key, "")
+            formatted.append(f"    - {emoji} **{key}**: {value}\n  ")
+        else:
+            formatted.append(f"    - {section}  ")
+    
+    return "\n".join(formatted)
+
+def build_gym_table(encoders):
+    plans = []
+    for fitness_plan in encoders['Fitness Plan'].classes_:
+        exercises, diet, equipment, recommendation = fitness_plan.split(" | ")[:4]
+        plans.append(GymPlan(
+            exercises, diet, equipment, recommendation,
+            bullet_points(exercises), diet_section(diet),
+            bullet_points(equipment), recommendations(recommendation),
+        ))
+    return tuple(plans)
+
+def build_diet_table(encoders):
+    return tuple(str(label) for label in encoders['Diet_Recommendation'].classes_)
+
+_BUILDERS = {
+    "gym_encoders": build_gym_table,
+    "diet_encoders": build_diet_table,
+}
+_tables = {}
+_lock = threading.Lock()
+
+def decode_table(name):
+    version = model_version(name)
+    cached = _tables.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        cached = _tables.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, _BUILDERS[name](get_model(name)))
+            _tables[name] = cached
+    return cached[1]
+
+def load_decode_tables():
+    for name in _BUILDERS:
+        decode_table(name)
+
+def gym_plan(class_id):
+    return decode_table("gym_encoders")[int(class_id)]
+
+def diet_label(class_id):
+    return decode_table("diet_encoders")[int(class_id)]
@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from batching import MicroBatcher
+import cohort_analytics
+from db import fetch_one, transaction
+from feature_encoder import get_encoder, weight_categories
+import gym_lookup
+import plan_cache
+from plan_decoder import diet_label, gym_plan
+from tracing import traced
+from tree_export import get_predictor
+
+# Profiles use the User_info column names; BMI and level are derived.
+PROFILE_COLUMNS = [
+    "user_id", "Age", "Gender", "Weight", "height",
+    "Fitness Goal", "Fitness Type", "Disease_Type", "Severity", "Physical_Activity_Level",
+    "Daily_Caloric_Intake", "Cholesterol", "Blood_Pressure", "Glucose",
+    "Dietary_Restrictions", "Allergies", "Preferred_Cuisine",
+    "Weekly_Exercise_Hours", "Adherence_to_Diet_Plan", "Dietary_Nutrient_Imbalance_Score",
+]
+USER_INFO_COLUMNS = PROFILE_COLUMNS[:5] + ["BMI", "level"] + PROFILE_COLUMNS[5:]
+OPTIONAL_LABELS = ["Disease_Type", "Dietary_Restrictions", "Allergies"]
+
+PLAN_UPSERT = (
+    "INSERT INTO plan (user_id, gym_rec, diet_rec) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET gym_rec = excluded.gym_rec, diet_rec = excluded.diet_rec"
+)
+# Concurrent single-plan requests (one per Streamlit session thread) are
+# coalesced into one vectorized predict per batch.
+BATCH_MAX = int(os.environ.get("FITNESS_BATCH_MAX", "64"))
+BATCH_WAIT_MS = float(os.environ.get("FITNESS_BATCH_WAIT_MS", "2"))
+
+USER_INFO_UPSERT = "INSERT OR REPLACE INTO User_info ({}) VALUES ({})".format(
+    ", ".join(f'"{c}"' for c in USER_INFO_COLUMNS), ", ".join("?" * len(USER_INFO_COLUMNS))
+)
+
+def body_mass_index(weight, height_m):
+    # Python's round, not np.round, everywhere (form, batch, gym lookup
+    # grid): at rounding edges they disagree, and so would BMI level and
+    # the plan-cache key.
+    return round(weight / pow(height_m, 2), 2)
+
+def get_weight_category(bmi):
+    if bmi < 18.5:
+        return "Underweight"
+    elif 18.5 <= bmi < 24.9:
+        return "Normal"
+    elif 25 <= bmi < 29.9:
+        return "Overweight"
+    else:
+        return "Obese"
+
+def complete_profile(profile):
+    missing = [c for c in PROFILE_COLUMNS[1:] if c not in profile]
+    if missing:
+        raise ValueError(f"Missing profile fields: {missing}")
+    profile = dict(profile)
+    for column in OPTIONAL_LABELS:
+        if profile[column] is None:
+            profile[column] = "None"
+    profile["height_m"] = profile["height"] / 100
+    profile["BMI"] = body_mass_index(profile["Weight"], profile["height_m"])
+    profile["level"] = get_weight_category(profile["BMI"])
+    return profile
+
+def prepare_profiles(frame):
+    missing = [c for c in PROFILE_COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing profile columns: {missing}")
+    frame = frame[PROFILE_COLUMNS].copy()
+    for column in OPTIONAL_LABELS:
+        frame[column] = frame[column].fillna("None")
+    frame["height_m"] = frame["height"].to_numpy(dtype=np.float64) / 100
+    frame["BMI"] = np.array([body_mass_index(weight, height_m) for weight, height_m in
+                             zip(frame["Weight"].to_numpy(dtype=np.float64).tolist(), frame["height_m"].tolist())])
+    frame["level"] = weight_categories(frame["BMI"].to_numpy())
+    return frame
+
+def predict_encoded(gym_encoder, diet_encoder, gym_X, diet_X):
+    # Rows already seen with the current models come from plan_cache.
+    def predict(gym_rows, diet_rows):
+        return gym_predict(gym_encoder.frame(gym_rows)), diet_predict(diet_encoder.frame(diet_rows))
+    return plan_cache.cached_predict(gym_X, diet_X, predict)
+
+def predict_profile(profile):
+    profile = complete_profile(profile)
+    gym_encoder, diet_encoder = get_encoder("gym"), get_encoder("diet")
+    gym, diet = predict_encoded(gym_encoder, diet_encoder,
+                                gym_encoder.encode_record(profile), diet_encoder.encode_record(profile))
+    return int(gym[0]), int(diet[0])
+
+def predict_batch(frame):
+    gym_encoder, diet_encoder = get_encoder("gym"), get_encoder("diet")
+    return predict_encoded(gym_encoder, diet_encoder,
+                           gym_encoder.encode_columns(frame), diet_encoder.encode_columns(frame))
+
+@traced("model.predict_plans")
+def predict_plans(profiles):
+    if not profiles:
+        return []
+    if len(profiles) == 1:
+        # The record path skips building a DataFrame for a lone request.
+        return [predict_profile(profiles[0])]
+    frame = prepare_profiles(pd.DataFrame([{"user_id": 0, **p} for p in profiles]))
+    gym, diet = predict_batch(frame)
+    return list(zip(gym.tolist(), diet.tolist()))
+
+plan_batcher = MicroBatcher(predict_plans, BATCH_MAX, BATCH_WAIT_MS, name="plan-batcher")
+
+def predict_plan(profile):
+    return plan_batcher.submit(profile)
+
+def batch_stats():
+    return plan_batcher.stats()
+
+def warm_up():
+    # Loads every artifact a prediction touches, so the first real request
+    # does not pay for it.
+    get_encoder("gym"), get_encoder("diet")
+    get_predictor("gym"), get_predictor("diet")
+    gym_lookup.active_lookup()
+
+def save_plan(conn, user_id, profile, gym_rec, diet_rec):
+    profile = complete_profile(profile)
+    # Goal, level and adherence may change, so both rollups are updated.
+    cohort_analytics.retract(conn, [user_id])
+    conn.execute(PLAN_UPSERT, (user_id, gym_rec, diet_rec))
+    conn.execute(USER_INFO_UPSERT, [user_id] + [profile[c] for c in USER_INFO_COLUMNS[1:]])
+    cohort_analytics.contribute(conn, [user_id])
+
+def create_plan(user_id, profile):
+    gym_rec, diet_rec = predict_plan(profile)
+    with transaction(user_id) as conn:
+        save_plan(conn, user_id, profile, gym_rec, diet_rec)
+    return gym_rec, diet_rec
+
+def get_plan(user_id):
+    row = fetch_one("SELECT gym_rec, diet_rec FROM plan WHERE user_id = ?", (user_id,), user_id=user_id)
+    if row is None:
+        return None
+    gym_rec, diet_rec = row
+    plan = gym_plan(gym_rec)
+    return {
+        "user_id": user_id,
+        "gym_rec": gym_rec,
+        "diet_rec": diet_rec,
+        "diet_type": diet_label(diet_rec),
+        "exercises": plan.exercises,
+        "diet": plan.diet,
+        "equipment": plan.equipment,
+        "recommendation": plan.recommendation,
+    }
+
+@traced("model.gym_predict")
+def gym_predict(gym_features):
+    prediction = gym_lookup.predict(gym_features)
+    return prediction
+
+@traced("model.diet_predict")
+def diet_predict(diet_features):
+    diet_model = get_predictor("diet")
+    prediction = diet_model.predict(diet_features)
+    return prediction
@@ -0,0 +1,142 @@
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+import cohort_analytics
+from db import fetch_all, fetch_one, transaction
+
+EPOCH = date(2020, 1, 1)
+# Beyond this many raw entries the chart switches to weekly, then monthly means.
+MAX_POINTS = 120
+HISTORY_ROWS = 20
+
+Summary = namedtuple("Summary", [
+    "entries", "version", "start_date", "start_weight", "last_date", "last_weight",
+    "sum_x", "sum_y", "sum_xx", "sum_xy",
+])
+
+SUMMARY_UPSERT = """
+    INSERT INTO progress_summary
+        (user_id, entries, version, start_date, start_weight, last_date, last_weight, sum_x, sum_y, sum_xx, sum_xy)
+        VALUES (?, 1, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        entries = entries + 1,
+        version = version + 1,
+        start_weight = CASE WHEN excluded.start_date < start_date THEN excluded.start_weight ELSE start_weight END,
+        start_date = MIN(start_date, excluded.start_date),
+        last_weight = CASE WHEN excluded.last_date >= last_date THEN excluded.last_weight ELSE last_weight END,
+        last_date = MAX(last_date, excluded.last_date),
+        sum_x = sum_x + excluded.sum_x,
+        sum_y = sum_y + excluded.sum_y,
+        sum_xx = sum_xx + excluded.sum_xx,
+        sum_xy = sum_xy + excluded.sum_xy
+"""
+ROLLUP_UPSERT = """
+    INSERT INTO progress_rollup (user_id, period, bucket, entries, weight_sum, min_weight, max_weight)
+        VALUES (?, ?, ?, 1, ?, ?, ?)
+    ON CONFLICT (user_id, period, bucket) DO UPDATE SET
+        entries = entries + 1,
+        weight_sum = weight_sum + excluded.weight_sum,
+        min_weight = MIN(min_weight, excluded.min_weight),
+        max_weight = MAX(max_weight, excluded.max_weight)
+"""
+
+def week_bucket(day):
+    return day - timedelta(days=day.weekday())
+
+def month_bucket(day):
+    return day.replace(day=1)
+
+def apply_entries(conn, entries):
+    # Inserts (user_id, previous_weight, new_weight, day) entries and folds
+    # them into the summaries: the same as one apply_entry per entry, in
+    # order, except that the cohort rollups are left to the caller.
+    progress_rows, summary_rows, rollup_rows = [], [], []
+    for user_id, previous_weight, new_weight, day in entries:
+        x = (day - EPOCH).days
+        progress_rows.append((user_id, previous_weight, new_weight, day.isoformat()))
+        summary_rows.append((
+            user_id, day.isoformat(), previous_weight, day.isoformat(), new_weight,
+            x, new_weight, x * x, x * new_weight,
+        ))
+        for period, bucket in (("week", week_bucket(day)), ("month", month_bucket(day))):
+            rollup_rows.append((user_id, period, bucket.isoformat(), new_weight, new_weight, new_weight))
+    conn.executemany("INSERT INTO progress (user_id, previous_weight, new_weight, date) VALUES (?, ?, ?, ?)",
+                     progress_rows)
+    conn.executemany(SUMMARY_UPSERT, summary_rows)
+    conn.executemany(ROLLUP_UPSERT, rollup_rows)
+
+def apply_entry(conn, user_id, previous_weight, new_weight, day):
+    cohort_analytics.retract(conn, [user_id], [cohort_analytics.OUTCOME])
+    apply_entries(conn, [(user_id, previous_weight, new_weight, day)])
+    cohort_analytics.contribute(conn, [user_id], [cohort_analytics.OUTCOME])
+
+def record_weight(user_id, previous_weight, new_weight, day):
+    with transaction(user_id) as conn:
+        conn.execute("UPDATE User_info SET Weight = ? WHERE user_id = ?", (new_weight, user_id))
+        apply_entry(conn, user_id, previous_weight, new_weight, day)
+
+def get_summary(user_id):
+    row = fetch_one(
+        "SELECT entries, version, start_date, start_weight, last_date, last_weight, sum_x, sum_y, sum_xx, sum_xy "
+        "FROM progress_summary WHERE user_id = ?",
+        (user_id,), user_id=user_id,
+    )
+    return Summary(*row) if row else None
+
+def trend_per_day(summary):
+    # Least-squares slope of weight against date, in kg/day.
+    if summary is None or summary.entries < 2:
+        return None
+    n = summary.entries
+    denominator = n * summary.sum_xx - summary.sum_x ** 2
+    if denominator <= 0:
+        return None
+    return (n * summary.sum_xy - summary.sum_x * summary.sum_y) / denominator
+
+def eta_days(summary, target_weight):
+    slope = trend_per_day(summary)
+    if slope is None or target_weight is None or slope == 0:
+        return None
+    days = (target_weight - summary.last_weight) / slope
+    return days if days >= 0 else None
+
+def recent_entries(user_id, limit=HISTORY_ROWS):
+    rows = fetch_all(
+        "SELECT previous_weight, new_weight, date FROM progress WHERE user_id = ? ORDER BY date DESC, progress_id DESC LIMIT ?",
+        (user_id, limit), user_id=user_id,
+    )
+    return rows[::-1]
+
+def latest_means(user_id):
+    means = {}
+    for period in ("week", "month"):
+        row = fetch_one(
+            "SELECT weight_sum / entries FROM progress_rollup WHERE user_id = ? AND period = ? ORDER BY bucket DESC LIMIT 1",
+            (user_id, period), user_id=user_id,
+        )
+        means[period] = row[0] if row else None
+    return means
+
+@lru_cache(maxsize=1024)
+def weight_timeline(user_id, version):
+    # version is the summary's insert counter, so a new entry is a new key.
+    summary = get_summary(user_id)
+    if summary is None:
+        return ()
+    start = date.fromisoformat(summary.start_date)
+    last = date.fromisoformat(summary.last_date)
+
+    if summary.entries <= MAX_POINTS:
+        rows = fetch_all("SELECT date, new_weight FROM progress WHERE user_id = ? ORDER BY date, progress_id", (user_id,), user_id=user_id)
+        points = [(date.fromisoformat(d), w) for d, w in rows]
+    else:
+        period = "week" if (last - start).days // 7 < MAX_POINTS else "month"
+        rows = fetch_all(
+            "SELECT bucket, weight_sum / entries FROM progress_rollup WHERE user_id = ? AND period = ? ORDER BY bucket",
+            (user_id, period), user_id=user_id,
+        )
+        points = [(date.fromisoformat(b), w) for b, w in rows]
+        start = min(start, points[0][0])
+
+    return ((start - timedelta(days=1), summary.start_weight),) + tuple(points)
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+import db
+import plan_cache
+import planner
+from batching import MicroBatcher
+import progress_store
+from model_registry import registry_stats
+
+# Headless plan service: the same planner/progress_store calls the UI makes
+# in-process, behind a small JSON API. Inference runs in a worker pool so one
+# slow batch never blocks the event loop; SQLite writes go to a thread pool.
+# Single-plan requests are micro-batched before they reach the pool.
+
+PLAN_PATH = re.compile(r"^/plans/(\d+)$")
+PROGRESS_PATH = re.compile(r"^/progress/(\d+)$")
+MAX_BODY_BYTES = 1 << 20
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _require(payload, *fields):
+    missing = [f for f in fields if f not in payload]
+    if missing:
+        raise HttpError(400, f"Missing fields: {missing}")
+
+def _profiles(value):
+    if not isinstance(value, list) or not all(isinstance(profile, dict) for profile in value):
+        raise HttpError(400, "profiles must be a list of objects")
+    return value
+
+class PlanService:
+    def __init__(self, workers=2, max_batch=planner.BATCH_MAX, max_wait_ms=planner.BATCH_WAIT_MS):
+        self.workers = workers
+        self.inference = None
+        self.io = None
+        self.batcher = MicroBatcher(self._predict_batch, max_batch, max_wait_ms, name="service-batcher")
+
+    def start(self):
+        if self.workers > 0:
+            self.inference = ProcessPoolExecutor(self.workers, initializer=planner.warm_up)
+        else:
+            self.inference = ThreadPoolExecutor(1, initializer=planner.warm_up)
+        self.io = ThreadPoolExecutor(db.POOL_SIZE)
+
+    def stop(self):
+        for executor in (self.inference, self.io):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self.inference = self.io = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        try:
+            payload = await self._read_json(receive)
+            status, body = 200, await self.route(scope["method"], scope["path"], payload)
+        except HttpError as error:
+            status, body = error.status, {"error": str(error)}
+        except ValueError as error:
+            status, body = 400, {"error": str(error)}
+        data = json.dumps(body).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    async def _read_json(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HttpError(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        raw = b"".join(chunks)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON") from None
+
+    async def _run(self, executor, fn, *args):
+        if executor is None:
+            raise HttpError(503, "Service is not started")
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def _predict_batch(self, profiles):
+        if self.inference is None:
+            raise HttpError(503, "Service is not started")
+        return self.inference.submit(planner.predict_plans, profiles).result()
+
+    async def predict(self, profiles):
+        return await self._run(self.inference, planner.predict_plans, profiles)
+
+    async def predict_one(self, profile):
+        return await asyncio.wrap_future(self.batcher.submit_async(profile))
+
+    async def route(self, method, path, payload):
+        if method == "GET" and path == "/health":
+            return {"status": "ok", "models": registry_stats(), "db": db.stats()}
+
+        if method == "GET" and path == "/metrics":
+            # The plan cache is per process; this is the view of whichever
+            # inference worker picks the call up (the shared tier is common).
+            return {"batching": self.batcher.stats(), "plan_cache": await self._run(self.inference, plan_cache.stats)}
+
+        if method == "POST" and path == "/predict":
+            _require(payload or {}, "profiles")
+            predictions = await self.predict(_profiles(payload["profiles"]))
+            return {"predictions": [{"gym_rec": g, "diet_rec": d} for g, d in predictions]}
+
+        if method == "POST" and path == "/plans":
+            _require(payload or {}, "user_id", "profile")
+            user_id, profile = int(payload["user_id"]), payload["profile"]
+            if not isinstance(profile, dict):
+                raise HttpError(400, "profile must be an object")
+            gym_rec, diet_rec = await self.predict_one(profile)
+            await self._run(self.io, self._save_plan, user_id, profile, gym_rec, diet_rec)
+            return {"user_id": user_id, "gym_rec": gym_rec, "diet_rec": diet_rec}
+
+        match = PLAN_PATH.match(path)
+        if method == "GET" and match:
+            plan = await self._run(self.io, planner.get_plan, int(match.group(1)))
+            if plan is None:
+                raise HttpError(404, "No plan for this user")
+            return plan
+
+        if method == "POST" and path == "/progress":
+            _require(payload or {}, "user_id", "previous_weight", "new_weight", "date")
+            await self._run(
+                self.io, progress_store.record_weight,
+                int(payload["user_id"]), float(payload["previous_weight"]), float(payload["new_weight"]),
+                date.fromisoformat(payload["date"]),
+            )
+            return {"status": "recorded"}
+
+        match = PROGRESS_PATH.match(path)
+        if method == "GET" and match:
+            user_id = int(match.group(1))
+            summary = await self._run(self.io, progress_store.get_summary, user_id)
+            if summary is None:
+                raise HttpError(404, "No progress for this user")
+            return {
+                "user_id": user_id,
+                "summary": summary._asdict(),
+                "trend_per_day": progress_store.trend_per_day(summary),
+                "recent": await self._run(self.io, progress_store.recent_entries, user_id),
+            }
+
+        raise HttpError(404, f"No route for {method} {path}")
+
+    @staticmethod
+    def _save_plan(user_id, profile, gym_rec, diet_rec):
+        with db.transaction(user_id) as conn:
+            planner.save_plan(conn, user_id, profile, gym_rec, diet_rec)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fitness plans over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="inference processes (0 runs inference on a thread in the server process)")
+    parser.add_argument("--max-batch", type=int, default=planner.BATCH_MAX)
+    parser.add_argument("--max-wait-ms", type=float, default=planner.BATCH_WAIT_MS)
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--shards", default=db.SHARDS_PATH, help="shard manifest (default: $FITNESS_SHARDS, else shards.json next to --db)")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("service.py needs an ASGI server: pip install uvicorn") from None
+
+    db.configure(args.db, shards=args.shards)
+    uvicorn.run(PlanService(args.workers, args.max_batch, args.max_wait_ms), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
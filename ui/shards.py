@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+import cohort_analytics
+import db
+from migrations import migrate, schema_version
+
+# Online split of the single database into user shards (see db.ShardRouter).
+#
+# 1. Triggers on the per-user tables note every user written from then on.
+# 2. Each shard file gets the schema and its users' rows, copied a range of
+#    user ids at a time while the app keeps running (in WAL mode the copy's
+#    reads never block its writes), then its cohort rollups are rebuilt.
+# 3. Users written in the meantime are copied again, until few are left.
+# 4. Cutover, holding the directory's write lock: the last of them are
+#    copied, the manifest is written and the triggers are swapped for ones
+#    refusing writes to the per-user tables. Every process routes to the
+#    shards from its next query on; only a write already waiting on the
+#    lock fails.
+#
+# The User table stays in the directory; `cleanup` deletes the moved rows
+# from it afterwards.
+
+CHUNK_USERS = 20000
+CATCH_UP_ROUNDS = 10
+# Few enough users to copy while writers wait on the cutover lock.
+CUTOVER_USERS = 500
+DIRTY_TABLE = "shard_split_dirty"
+MOVED = "moved to shards"
+CHANGE_EVENTS = [("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")]
+
+def connect(path):
+    # Shared with the fan-out threads, one at a time.
+    conn = sqlite3.connect(path, timeout=db.BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False)
+    for pragma in db.PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def capture_changes(source):
+    source.execute(f"CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (user_id INTEGER PRIMARY KEY)")
+    for table in db.USER_TABLES:
+        for event, row in CHANGE_EVENTS:
+            source.execute(
+                f'CREATE TRIGGER IF NOT EXISTS shard_split_{table}_{event.lower()} AFTER {event} ON "{table}" '
+                # Not INSERT OR IGNORE: an upsert's conflict policy would override it.
+                f"BEGIN INSERT INTO {DIRTY_TABLE} SELECT {row}.user_id WHERE NOT EXISTS "
+                f"(SELECT 1 FROM {DIRTY_TABLE} WHERE user_id = {row}.user_id); END"
+            )
+
+def fence(source):
+    # Replaces the change capture; a process still routing a user to the
+    # directory gets an error instead of writing where nobody reads.
+    for table in db.USER_TABLES:
+        for event, _ in CHANGE_EVENTS:
+            source.execute(f"DROP TRIGGER IF EXISTS shard_split_{table}_{event.lower()}")
+        for event in ("INSERT", "UPDATE"):
+            source.execute(
+                f'CREATE TRIGGER shard_moved_{table}_{event.lower()} BEFORE {event} ON "{table}" '
+                f"BEGIN SELECT RAISE(ABORT, '{MOVED}'); END"
+            )
+    source.execute(f"DROP TABLE {DIRTY_TABLE}")
+
+def create_shard(source, path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shard = connect(path)
+    shard.execute("BEGIN")
+    for (sql,) in source.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND type IN ('table', 'index') "
+        "AND name NOT LIKE 'sqlite_%' AND name != ? ORDER BY type = 'index'", (DIRTY_TABLE,)
+    ):
+        shard.execute(sql)
+    shard.execute(f"PRAGMA user_version = {schema_version(source)}")
+    shard.execute("COMMIT")
+    shard.execute("ATTACH DATABASE ? AS src", (source.execute("PRAGMA database_list").fetchone()[2],))
+    return shard
+
+def copy_range(shard, index, count, low, high):
+    # One transaction, so every table is read from the same snapshot.
+    shard.execute("BEGIN")
+    for table in db.USER_TABLES:
+        shard.execute(
+            f'INSERT INTO main."{table}" SELECT * FROM src."{table}" '
+            "WHERE user_id BETWEEN ? AND ? AND user_id % ? = ?", (low, high, count, index)
+        )
+    shard.execute("COMMIT")
+
+def recopy(shard, user_ids):
+    if not user_ids:
+        return
+    shard.execute("BEGIN")
+    cohort_analytics.retract(shard, user_ids)
+    shard.execute("CREATE TEMP TABLE IF NOT EXISTS split_users (user_id INTEGER PRIMARY KEY)")
+    shard.execute("DELETE FROM temp.split_users")
+    shard.executemany("INSERT INTO temp.split_users VALUES (?)", ((u,) for u in user_ids))
+    for table in db.USER_TABLES:
+        shard.execute(f'DELETE FROM main."{table}" WHERE user_id IN (SELECT user_id FROM temp.split_users)')
+        shard.execute(f'INSERT INTO main."{table}" SELECT * FROM src."{table}" '
+                      "WHERE user_id IN (SELECT user_id FROM temp.split_users)")
+    cohort_analytics.contribute(shard, user_ids)
+    shard.execute("COMMIT")
+
+def recopy_users(shards, user_ids):
+    count = len(shards)
+    db.fan_out(lambda item: recopy(item[1], [u for u in user_ids if u % count == item[0]]), enumerate(shards))
+
+def take_dirty(source):
+    source.execute("BEGIN IMMEDIATE")
+    user_ids = [u for (u,) in source.execute(f"SELECT user_id FROM {DIRTY_TABLE}")]
+    source.execute(f"DELETE FROM {DIRTY_TABLE}")
+    source.execute("COMMIT")
+    return user_ids
+
+def user_id_range(source):
+    lows, highs = zip(*(source.execute(f'SELECT MIN(user_id), MAX(user_id) FROM "{table}"').fetchone()
+                        for table in db.USER_TABLES))
+    lows, highs = [v for v in lows if v is not None], [v for v in highs if v is not None]
+    return (min(lows), max(highs)) if lows else (0, -1)
+
+def write_manifest(manifest, paths, count):
+    base = os.path.dirname(os.path.abspath(manifest))
+    layout = {
+        "key": f"user_id % {count}",
+        "shards": [os.path.relpath(os.path.abspath(p), base) for p in paths],
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp = manifest + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(layout, f, indent=2)
+    os.replace(tmp, manifest)
+
+def split(directory, count, manifest, out_dir=None, chunk_users=CHUNK_USERS, log=sys.stderr):
+    if os.path.exists(manifest):
+        raise SystemExit(f"{manifest} exists: the database is already split")
+    out_dir = out_dir or os.path.join(os.path.dirname(os.path.abspath(manifest)), "shards")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"shard-{i:02d}.db") for i in range(count)]
+    report = {"shards": count, "manifest": manifest}
+
+    start = time.perf_counter()
+    source = connect(directory)
+    migrate(source)
+    capture_changes(source)
+    shards = [create_shard(source, path) for path in paths]
+
+    low, high = user_id_range(source)
+    for first in range(low, high + 1, chunk_users):
+        last = min(first + chunk_users - 1, high)
+        db.fan_out(lambda item: copy_range(item[1], item[0], count, first, last), enumerate(shards))
+        print(f"copied user ids {low}-{last} of {high}", file=log)
+
+    def rebuild(shard):
+        shard.execute("BEGIN")
+        cohort_analytics.rebuild(shard)
+        shard.execute("COMMIT")
+
+    db.fan_out(rebuild, shards)
+    report["copy_seconds"] = round(time.perf_counter() - start, 2)
+
+    # Catch up with the writes made during the copy.
+    rounds = []
+    for _ in range(CATCH_UP_ROUNDS):
+        user_ids = take_dirty(source)
+        rounds.append(len(user_ids))
+        recopy_users(shards, user_ids)
+        if len(user_ids) <= CUTOVER_USERS:
+            break
+    report["catch_up_users"] = rounds
+
+    start = time.perf_counter()
+    source.execute("BEGIN IMMEDIATE")
+    try:
+        user_ids = [u for (u,) in source.execute(f"SELECT user_id FROM {DIRTY_TABLE}")]
+        recopy_users(shards, user_ids)
+        fence(source)
+        write_manifest(manifest, paths, count)
+        source.execute("COMMIT")
+    except BaseException:
+        source.execute("ROLLBACK")
+        if os.path.exists(manifest):
+            os.remove(manifest)
+        raise
+    report["cutover_users"] = len(user_ids)
+    report["cutover_seconds"] = round(time.perf_counter() - start, 3)
+
+    report["users_per_shard"] = [shard.execute("SELECT COUNT(*) FROM User_info").fetchone()[0] for shard in shards]
+    for shard in shards:
+        shard.close()
+    source.close()
+    return report
+
+def shard_counts(directory, manifest):
+    db.configure(directory, shards=manifest)
+
+    def counts(conn):
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in db.USER_TABLES}
+
+    per_shard = db.on_shards(counts)
+    db.close()
+    return {table: [shard[table] for shard in per_shard] for table in db.USER_TABLES}
+
+def cleanup(directory, manifest, chunk_users=CHUNK_USERS):
+    # Deletes the rows that moved to the shards from the directory.
+    if not os.path.exists(manifest):
+        raise SystemExit(f"{manifest} does not exist: nothing has been split")
+    source = connect(directory)
+    if source.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'shard_moved_%'").fetchone()[0] == 0:
+        raise SystemExit(f"{directory} was not fenced by a split; refusing to delete its rows")
+    deleted = dict.fromkeys(db.USER_TABLES, 0)
+    low, high = user_id_range(source)
+    for first in range(low, high + 1, chunk_users):
+        source.execute("BEGIN IMMEDIATE")
+        for table in db.USER_TABLES:
+            deleted[table] += source.execute(
+                f'DELETE FROM "{table}" WHERE user_id BETWEEN ? AND ?', (first, first + chunk_users - 1)
+            ).rowcount
+        source.execute("COMMIT")
+    for table in cohort_analytics.ROLLUP_TABLES.values():
+        source.execute(f"DELETE FROM {table}")
+    source.close()
+    return {"deleted": deleted}
+
+def status(directory, manifest):
+    source = connect(directory)
+    splitting = source.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (DIRTY_TABLE,)).fetchone()
+    result = {
+        "directory": directory,
+        "split_in_progress": splitting is not None,
+        "pending_users": source.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}").fetchone()[0] if splitting else None,
+    }
+    source.close()
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            result["layout"] = json.load(f)
+        start = time.perf_counter()
+        result["rows"] = shard_counts(directory, manifest)
+        result["fan_out_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Split FitnessCoach.db into per-user shards while it is in use.")
+    parser.add_argument("command", choices=["split", "status", "cleanup"])
+    parser.add_argument("--db", default=db.DB_PATH, help="the directory database (holds the User table)")
+    # The manifest the app reads: with neither set, both use shards.json
+    # next to the directory database.
+    parser.add_argument("--manifest", default=db.SHARDS_PATH, help="default: $FITNESS_SHARDS, else shards.json next to --db")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--out-dir", help="where the shard files go (default: shards/ next to the manifest)")
+    parser.add_argument("--chunk-users", type=int, default=CHUNK_USERS)
+    args = parser.parse_args()
+    args.manifest = args.manifest or db.default_manifest(args.db)
+
+    if args.command == "split":
+        result = split(args.db, args.shards, args.manifest, args.out_dir, args.chunk_users)
+    elif args.command == "cleanup":
+        result = cleanup(args.db, args.manifest, args.chunk_users)
+    else:
+        result = status(args.db, args.manifest)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
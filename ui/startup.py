@@ -0,0 +1,134 @@
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Cold-start support for app.py: page modules are imported when their page
+# is first shown, and once the first page has been sent a daemon thread
+# preloads the rest (models, encoders, decode tables, matplotlib) so later
+# pages and the first plan do not pay for it. Set FITNESS_WARM_UP=0 to skip
+# the preload.
+
+WARM_UP = os.environ.get("FITNESS_WARM_UP", "1") != "0"
+PAGE_MODULES = ["authentication", "form_page", "fitness_plan_page", "cohort_page", "database_page"]
+
+STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_imports = {}
+_warm_up = {}
+_first_paint = None
+_warm_up_thread = None
+
+def load_page(module, attr):
+    # module.attr, importing the module (and timing it) on first use.
+    if module not in sys.modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        with _lock:
+            _imports.setdefault(module, round(time.perf_counter() - start, 4))
+    return getattr(sys.modules[module], attr)
+
+def _warm_up_steps():
+    import plan_decoder
+    import planner
+    return [
+        *[(f"import {m}", lambda m=m: importlib.import_module(m)) for m in PAGE_MODULES],
+        ("import matplotlib", lambda: importlib.import_module("matplotlib.figure")),
+        ("decode tables", plan_decoder.load_decode_tables),
+        ("models and encoders", planner.warm_up),
+    ]
+
+def _run_warm_up():
+    start = time.perf_counter()
+    try:
+        steps = _warm_up_steps()
+    except Exception as error:
+        steps = []
+        _warm_up["error"] = repr(error)
+    for name, step in steps:
+        step_start = time.perf_counter()
+        try:
+            step()
+        except Exception as error:
+            # A missing artifact must not take the UI down; the page that
+            # needs it reports the error itself.
+            _warm_up[name] = repr(error)
+            continue
+        _warm_up[name] = round(time.perf_counter() - step_start, 4)
+    _warm_up["total"] = round(time.perf_counter() - start, 4)
+
+def start_warm_up():
+    global _warm_up_thread
+    with _lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_run_warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+def first_paint():
+    # Called at the end of the script run: by then the page has been sent.
+    global _first_paint
+    if _first_paint is None:
+        _first_paint = round(time.perf_counter() - STARTED, 4)
+        if WARM_UP:
+            start_warm_up()
+
+def report():
+    with _lock:
+        imports = dict(_imports)
+    return {
+        "first_paint_seconds": _first_paint,
+        "page_imports_seconds": imports,
+        "warm_up_seconds": dict(_warm_up) if _warm_up_thread is not None else None,
+    }
+
+# -- offline report: cold import cost of each page, by package --------------
+
+def import_times(module):
+    # Cold import time (s) by top-level package, for everything module pulls
+    # in. Each module's own ("self") time is charged to its top-level
+    # package, so the figures do not overlap and add up to the total.
+    code = "import streamlit, streamlit_option_menu, startup, tracing"
+    if module:
+        code += f"; import {module}"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                                   os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        times[package] = times.get(package, 0.0) + int(own) / 1e6
+    return times
+
+def cold_start_report(modules=PAGE_MODULES, top=8):
+    # Measured against the shell app.py always imports.
+    base = import_times(None)
+    pages = {}
+    for module in modules:
+        added = {name: t - base.get(name, 0.0) for name, t in import_times(module).items()}
+        added = {name: t for name, t in added.items() if t > 0.0005}
+        heaviest = sorted(added.items(), key=lambda item: -item[1])[:top]
+        pages[module] = {
+            "seconds": round(sum(added.values()), 4),
+            "heaviest": {name: round(t, 4) for name, t in heaviest},
+        }
+    return {"shell_seconds": round(sum(base.values()), 4), "pages": pages}
+
+def main():
+    parser = argparse.ArgumentParser(description="Report each page's cold import cost, by package.")
+    parser.add_argument("modules", nargs="*", default=PAGE_MODULES)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(cold_start_report(args.modules, args.top), indent=2))
+
+if __name__ == "__main__":
+    main()
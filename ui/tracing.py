@@ -0,0 +1,326 @@
+import atexit
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# Spans and counters for the page functions and the DB/model calls under
+# them. Off unless FITNESS_TRACE is set: traced() then returns the function
+# untouched and span() hands back one shared no-op context manager.
+#
+#   FITNESS_TRACE=1              collect in memory
+#   FITNESS_TRACE_JSONL=path     also append one JSON line per finished span
+#   FITNESS_TRACE_PORT=9464      serve Prometheus text on /metrics
+#
+# Profiling (cProfile or stack sampling) is separate and per session; see
+# profiled(). The app only offers it when FITNESS_PROFILE is set: its reports
+# show file paths and internals.
+
+ENABLED = os.environ.get("FITNESS_TRACE", "") not in ("", "0")
+JSONL_PATH = os.environ.get("FITNESS_TRACE_JSONL")
+PORT = int(os.environ.get("FITNESS_TRACE_PORT", "0"))
+ENABLED = ENABLED or bool(JSONL_PATH) or bool(PORT)
+PROFILING = os.environ.get("FITNESS_PROFILE", "") not in ("", "0")
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SAMPLE_INTERVAL = 0.005
+PROFILE_ROWS = 25
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+class _SpanStats:
+    __slots__ = ("count", "total", "errors", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+class Tracer:
+    def __init__(self, jsonl_path=None):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans = defaultdict(_SpanStats)
+        self._counters = Counter()
+        self._jsonl = open(jsonl_path, "a", buffering=1) if jsonl_path else None
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, name, seconds, parent=None, error=False, attrs=None):
+        with self._lock:
+            stats = self._spans[name]
+            stats.count += 1
+            stats.total += seconds
+            stats.errors += error
+            stats.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps({
+                    "ts": round(time.time(), 6), "span": name, "parent": parent,
+                    "ms": round(seconds * 1e3, 3), "thread": threading.current_thread().name,
+                    "error": error, **(attrs or {}),
+                }, default=str) + "\n")
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            spans = {
+                name: {"count": s.count, "total_seconds": round(s.total, 6), "errors": s.errors,
+                       "buckets": list(s.buckets)}
+                for name, s in self._spans.items()
+            }
+            return {"spans": spans, "counters": dict(self._counters)}
+
+    def prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP fitness_span_seconds Time spent in traced spans.",
+            "# TYPE fitness_span_seconds histogram",
+        ]
+        for name, s in sorted(snapshot["spans"].items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), s["buckets"]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'fitness_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'fitness_span_seconds_sum{{span="{name}"}} {s["total_seconds"]}')
+            lines.append(f'fitness_span_seconds_count{{span="{name}"}} {s["count"]}')
+        lines += ["# HELP fitness_span_errors_total Spans that raised.", "# TYPE fitness_span_errors_total counter"]
+        lines += [f'fitness_span_errors_total{{span="{n}"}} {s["errors"]}' for n, s in sorted(snapshot["spans"].items())]
+        lines += ["# HELP fitness_events_total Traced event counters.", "# TYPE fitness_events_total counter"]
+        lines += [f'fitness_events_total{{event="{n}"}} {v}' for n, v in sorted(snapshot["counters"].items())]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "parent")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.tracer._stack().pop()
+        # Only Exceptions count as errors: st.rerun()/st.stop() unwind with
+        # BaseExceptions.
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        self.tracer.record(self.name, elapsed, self.parent, error, self.attrs)
+        return False
+
+tracer = Tracer(JSONL_PATH) if ENABLED else None
+
+def span(name, **attrs):
+    if tracer is None:
+        return _NO_SPAN
+    return _Span(tracer, name, attrs)
+
+def count(name, value=1):
+    if tracer is not None:
+        tracer.count(name, value)
+
+def traced(name):
+    def decorate(fn):
+        if tracer is None:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(tracer, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def snapshot():
+    return tracer.snapshot() if tracer is not None else {"spans": {}, "counters": {}}
+
+_server = None
+
+def serve_metrics(port=PORT, host="127.0.0.1"):
+    # Plain http.server on a daemon thread: GET /metrics (Prometheus text)
+    # and GET /metrics.json.
+    global _server
+    if tracer is None or _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, kind = tracer.prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = json.dumps(tracer.snapshot()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name="trace-metrics", daemon=True).start()
+    return _server
+
+if tracer is not None:
+    atexit.register(tracer.close)
+    if PORT:
+        try:
+            serve_metrics(PORT)
+        except OSError:
+            # Another Streamlit process already serves this port.
+            pass
+
+# -- per-session profiling -------------------------------------------------
+
+class _Sampler:
+    # Samples the calling thread's stack every SAMPLE_INTERVAL seconds and
+    # counts the innermost frame and every frame on the stack.
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.own = Counter()
+        self.total = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.own[_frame_key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = _frame_key(frame)
+                if key not in seen:
+                    self.total[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, rows=PROFILE_ROWS):
+        lines = [f"{self.samples} samples every {self.interval * 1e3:.0f} ms", "",
+                 f"{'own %':>7} {'total %':>8}  function"]
+        for key, total in self.total.most_common(rows):
+            lines.append(f"{100 * self.own[key] / max(self.samples, 1):7.1f} "
+                         f"{100 * total / max(self.samples, 1):8.1f}  {key}")
+        return "\n".join(lines)
+
+_profiling = threading.local()
+
+def _frame_key(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+@contextmanager
+def profiled(mode):
+    # Profiles the enclosed block with mode "cprofile" or "sample"; the
+    # yielded dict's "report" is filled in when the block exits. Mode None
+    # profiles nothing, and so does a block nested in a profiled one: the
+    # outer report already covers it.
+    result = {"mode": mode, "report": None}
+    if getattr(_profiling, "active", False):
+        mode = None
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time per process; another
+            # session holds it, so sample this one instead.
+            mode = result["mode"] = "sample"
+    if mode == "cprofile":
+        start = time.perf_counter()
+        _profiling.active = True
+        try:
+            yield result
+        finally:
+            _profiling.active = False
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_ROWS)
+            result["seconds"] = time.perf_counter() - start
+            result["report"] = out.getvalue()
+    elif mode == "sample":
+        sampler = _Sampler(threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        _profiling.active = True
+        try:
+            yield result
+        finally:
+            _profiling.active = False
+            sampler.stop()
+            result["seconds"] = time.perf_counter() - start
+            result["report"] = sampler.report()
+    else:
+        yield result
+
+@contextmanager
+def session_profiled(state, name):
+    # profiled() for a Streamlit rerun, or as a decorator for a fragment
+    # (whose reruns skip the app script): the mode comes from
+    # state["profile_mode"] and the last finished report is kept under
+    # state["profile_reports"][name]. state is st.session_state.
+    profile = None
+    try:
+        with profiled(state.get("profile_mode") if PROFILING else None) as profile:
+            yield
+    finally:
+        # st.rerun() unwinds through here too, so keep the last finished report.
+        if profile is not None and profile["report"] is not None:
+            state.setdefault("profile_reports", {})[name] = profile
@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import joblib
+import pandas as pd
+
+import datasets
+from model_registry import MODEL_PATHS, file_hash
+
+# Scripted version of data_preprocessing/*_cleaning.ipynb and
+# models/*_model.ipynb: raw data -> cleaned data -> encoders -> models.
+# Every stage is cached under CACHE_DIR by a hash of its inputs, so a rerun
+# only recomputes what changed. Each run writes a versioned directory under
+# VERSIONS_DIR with a manifest, then (unless told not to) promotes it to the
+# paths the app loads from.
+
+RAW_PATHS = {"gym": "data/gym recommendation.xlsx", "diet": "data/diet_recommendations_dataset.csv"}
+CLEANED_PATHS = {"gym": "data/cleaned_gym_data.csv", "diet": "data/cleaned_diet_data.csv"}
+CACHE_DIR = ".cache/training"
+VERSIONS_DIR = "models/versions"
+# Bump when a stage's code changes; it is part of every cache key.
+PIPELINE_VERSION = 1
+
+GYM_NUMERIC = ["Age", "Height", "Weight", "BMI"]
+GYM_CATEGORICAL = ["Sex", "Hypertension", "Diabetes", "Level", "Fitness Goal", "Fitness Type", "Fitness Plan"]
+DIET_CATEGORICAL = ["Gender", "Disease_Type", "Severity", "Physical_Activity_Level", "Dietary_Restrictions",
+                    "Allergies", "Preferred_Cuisine", "Diet_Recommendation"]
+TARGETS = {"gym": "Fitness Plan", "diet": "Diet_Recommendation"}
+
+TEST_SIZE = 0.2
+CV_FOLDS = 3
+SEED = 42
+
+def _random_forest(**params):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(random_state=SEED, **params)
+
+def _xgboost(**params):
+    import xgboost as xgb
+    # One thread per fit: the search already runs one fit per core.
+    return xgb.XGBClassifier(random_state=SEED, n_jobs=1, **params)
+
+# Candidate families per model, with the search space for each. The first
+# point of every space is the configuration the notebooks trained.
+SEARCH_SPACES = {
+    "gym": {
+        "xgboost": (_xgboost, {}, {
+            "n_estimators": [100, 150, 200],
+            "max_depth": [6, 4, 8],
+            "learning_rate": [0.3, 0.1],
+            "subsample": [1.0, 0.8],
+        }),
+        "random_forest": (_random_forest, {"class_weight": "balanced"}, {
+            "n_estimators": [100, 150],
+            "max_depth": [10, 20],
+            "min_samples_split": [2, 5],
+            "min_samples_leaf": [1, 2],
+        }),
+    },
+    "diet": {
+        "random_forest": (_random_forest, {}, {
+            "n_estimators": [100, 150, 200],
+            "max_depth": [None, 10, 20],
+            "min_samples_split": [2, 5],
+            "min_samples_leaf": [1, 2],
+        }),
+    },
+}
+
+def iqr_filter(frame, columns):
+    # Applied column by column, each on what the previous one kept, as the
+    # notebooks do.
+    for col in columns:
+        q1 = frame[col].quantile(0.25)
+        q3 = frame[col].quantile(0.75)
+        iqr = q3 - q1
+        frame = frame[(frame[col] >= q1 - 1.5 * iqr) & (frame[col] <= q3 + 1.5 * iqr)].reset_index(drop=True)
+    return frame
+
+def clean_gym(path):
+    data = datasets.load(path, index_col=0)
+    data = data.drop_duplicates().reset_index(drop=True)
+    data = iqr_filter(data, GYM_NUMERIC)
+    data = data[data["Recommendation"] != "Conclusion Recommendation"].reset_index(drop=True)
+    data["Fitness Plan"] = (
+        data["Exercises"] + " | " + data["Diet"] + " | " + data["Equipment"] + " | " + data["Recommendation"]
+    )
+    return data.drop(columns=["Exercises", "Diet", "Equipment", "Recommendation"])
+
+def clean_diet(path):
+    data = datasets.load(path, index_col=0)
+    numeric = data.drop(columns=DIET_CATEGORICAL).columns.tolist()
+    return iqr_filter(data, numeric)
+
+def encode(frame, categorical):
+    from sklearn.preprocessing import LabelEncoder
+
+    frame = frame.copy()
+    encoders = {}
+    for feature in categorical:
+        encoder = LabelEncoder()
+        frame[feature] = encoder.fit_transform(frame[feature])
+        encoders[feature] = encoder
+    return frame, encoders
+
+CLEANERS = {"gym": (clean_gym, GYM_CATEGORICAL), "diet": (clean_diet, DIET_CATEGORICAL)}
+
+def search(data, target, spaces, n_iter, n_jobs):
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.model_selection import ParameterGrid, RandomizedSearchCV, StratifiedKFold, train_test_split
+
+    X = data.drop(columns=[target])
+    y = data[target]
+    # Stratified so every class (some have only 3 rows) is in every split.
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SEED, stratify=y)
+    folds = StratifiedKFold(CV_FOLDS, shuffle=True, random_state=SEED)
+
+    candidates = {}
+    for family, (factory, fixed, space) in spaces.items():
+        start = time.perf_counter()
+        searcher = RandomizedSearchCV(
+            estimator=factory(**fixed),
+            param_distributions=space,
+            n_iter=min(n_iter, len(ParameterGrid(space))),
+            cv=folds,
+            scoring="accuracy",
+            n_jobs=n_jobs,
+            random_state=SEED,
+        )
+        searcher.fit(X_train, y_train)
+        candidates[family] = {
+            "search": searcher,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+
+    family = max(candidates, key=lambda f: candidates[f]["search"].best_score_)
+    best = candidates[family]["search"].best_estimator_
+    start = time.perf_counter()
+    predicted = best.predict(X_test)
+    return best, {
+        "family": family,
+        "params": candidates[family]["search"].best_params_,
+        "cv_accuracy": round(float(candidates[family]["search"].best_score_), 4),
+        "test_accuracy": round(float(accuracy_score(y_test, predicted)), 4),
+        "test_macro_f1": round(float(f1_score(y_test, predicted, average="macro")), 4),
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "predict_seconds": round(time.perf_counter() - start, 4),
+        "candidates": {
+            f: {
+                "cv_accuracy": round(float(c["search"].best_score_), 4),
+                "params": c["search"].best_params_,
+                "fits": len(c["search"].cv_results_["params"]) * CV_FOLDS,
+                "search_seconds": c["seconds"],
+            }
+            for f, c in candidates.items()
+        },
+    }
+
+class StageCache:
+    def __init__(self, directory=CACHE_DIR, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.log = []
+
+    def run(self, stage, inputs, fn):
+        key = hashlib.sha256(
+            json.dumps({"stage": stage, "pipeline": PIPELINE_VERSION, "inputs": inputs}, sort_keys=True, default=str)
+            .encode("utf-8")
+        ).hexdigest()
+        path = os.path.join(self.directory, f"{stage}-{key[:16]}.joblib")
+        start = time.perf_counter()
+        if self.enabled and os.path.exists(path):
+            value, hit = joblib.load(path), True
+        else:
+            value, hit = fn(), False
+            os.makedirs(self.directory, exist_ok=True)
+            joblib.dump(value, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self.log.append({"stage": stage, "key": key[:16], "cached": hit,
+                         "seconds": round(time.perf_counter() - start, 3)})
+        return key, value
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _library_versions():
+    import sklearn
+    versions = {"python": platform.python_version(), "pandas": pd.__version__, "scikit-learn": sklearn.__version__}
+    try:
+        import xgboost
+        versions["xgboost"] = xgboost.__version__
+    except ImportError:
+        pass
+    return versions
+
+def train_model(name, cache, n_iter, n_jobs):
+    clean, categorical = CLEANERS[name]
+    raw = RAW_PATHS[name]
+    clean_key, cleaned = cache.run(f"{name}-clean", {"raw": file_hash(raw)}, lambda: clean(raw))
+    encode_key, (encoded, encoders) = cache.run(f"{name}-encode", {"clean": clean_key},
+                                                lambda: encode(cleaned, categorical))
+    spaces = SEARCH_SPACES[name]
+    search_inputs = {
+        "encode": encode_key, "n_iter": n_iter, "cv": CV_FOLDS, "test_size": TEST_SIZE, "seed": SEED,
+        "spaces": {family: [fixed, space] for family, (_, fixed, space) in spaces.items()},
+    }
+    train_key, (model, metrics) = cache.run(f"{name}-train", search_inputs,
+                                            lambda: search(encoded, TARGETS[name], spaces, n_iter, n_jobs))
+    return train_key, {"cleaned": encoded, "encoders": encoders, "model": model, "metrics": metrics}
+
+def _write(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return file_hash(path)
+
+def run_pipeline(names=("gym", "diet"), n_iter=8, n_jobs=-1, promote=True, use_cache=True):
+    started = time.perf_counter()
+    cache = StageCache(enabled=use_cache)
+    results, keys = {}, []
+    for name in names:
+        key, results[name] = train_model(name, cache, n_iter, n_jobs)
+        keys.append(key)
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + "-" + \
+        hashlib.sha256("".join(keys).encode("utf-8")).hexdigest()[:8]
+    directory = os.path.join(VERSIONS_DIR, version)
+    artifacts = {}
+    for name, result in results.items():
+        files = {
+            f"{name}_model.pkl": lambda p, m=result["model"]: joblib.dump(m, p),
+            f"{name}_encoders.pkl": lambda p, e=result["encoders"]: joblib.dump(e, p),
+            f"cleaned_{name}_data.csv": lambda p, d=result["cleaned"]: d.to_csv(p, index=False),
+        }
+        for filename, write in files.items():
+            artifacts[filename] = _write(os.path.join(directory, filename), write)
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "libraries": _library_versions(),
+        "pipeline_version": PIPELINE_VERSION,
+        "raw_data": {name: {"path": RAW_PATHS[name], "sha256": file_hash(RAW_PATHS[name])} for name in results},
+        "models": {name: result["metrics"] for name, result in results.items()},
+        "artifacts": artifacts,
+        "stages": cache.log,
+        "wall_clock_seconds": round(time.perf_counter() - started, 2),
+        "promoted": promote,
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if promote:
+        promote_version(version, names)
+    return manifest
+
+def promote_version(version, names=("gym", "diet")):
+    # Copies a trained version to the paths the app loads from. The model
+    # registry notices the new content hashes; the gym lookup table and the
+    # compiled trees go stale and are ignored until rebuilt.
+    directory = os.path.join(VERSIONS_DIR, version)
+    for name in names:
+        targets = {
+            f"{name}_model.pkl": MODEL_PATHS[name],
+            f"{name}_encoders.pkl": MODEL_PATHS[f"{name}_encoders"],
+            f"cleaned_{name}_data.csv": CLEANED_PATHS[name],
+        }
+        for filename, target in targets.items():
+            shutil.copyfile(os.path.join(directory, filename), target + ".tmp")
+            os.replace(target + ".tmp", target)
+    shutil.copyfile(os.path.join(directory, "manifest.json"), "models/manifest.json")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the gym and diet models from the raw data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train")
+    # Names are checked after parsing: argparse (3.11) validates an empty
+    # nargs="*" list, or its default, against choices as a single value.
+    train.add_argument("models", nargs="*", metavar="{gym,diet}", help="default: both")
+    train.add_argument("--n-iter", type=int, default=8, help="search points per model family")
+    train.add_argument("--jobs", type=int, default=-1, help="parallel fits (-1: all cores)")
+    train.add_argument("--no-promote", action="store_true", help="only write the versioned artifacts")
+    train.add_argument("--no-cache", action="store_true", help="recompute every stage")
+
+    promote = sub.add_parser("promote")
+    promote.add_argument("version")
+    promote.add_argument("models", nargs="*", metavar="{gym,diet}", help="default: both")
+
+    args = parser.parse_args()
+    unknown = [name for name in args.models if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown model {unknown[0]!r} (choose from {', '.join(TARGETS)})")
+    args.models = args.models or list(TARGETS)
+    if args.command == "train":
+        manifest = run_pipeline(args.models, args.n_iter, args.jobs, not args.no_promote, not args.no_cache)
+        print(json.dumps(manifest, indent=2, default=str))
+    else:
+        promote_version(args.version, args.models)
+        print(f"Promoted {args.version}")
+
+if __name__ == "__main__":
+    main()
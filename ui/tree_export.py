@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from feature_encoder import get_encoder, get_validated_model
+from model_registry import get_model, registry
+
+TREES_DIR = "models/{}_trees"
+ARRAYS = ["feature", "threshold", "children", "default_left", "value", "roots", "tree_depth", "tree_class"]
+# Bounds the (rows x trees) node matrix walked per chunk.
+MAX_CELLS = 1 << 22
+
+# A tree ensemble flattened into node arrays and walked with NumPy. All
+# trees share one set of node arrays; roots holds each tree's first node.
+# Leaves point at themselves, so no per-row masking is needed; trees are
+# walked deepest first and each step drops the trees already done. value is
+# a per-node class distribution for a random forest, or a per-node leaf
+# margin for XGBoost (added to the margin of class tree_class[t]).
+class CompiledEnsemble:
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.kind = meta["kind"]
+        self.depth = meta["depth"]
+        self.classes_ = np.asarray(meta["classes"])
+        self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object)
+        self.base_margin = np.asarray(meta.get("base_margin", 0.0), dtype=np.float64)
+        # Trees grouped by class, so margins are one reduceat per batch.
+        self.class_order = np.argsort(self.tree_class, kind="stable")
+        self.class_starts = np.searchsorted(self.tree_class[self.class_order], np.arange(len(self.classes_)))
+        self.depth_order = np.argsort(-self.tree_depth, kind="stable")
+        self.depth_restore = np.argsort(self.depth_order)
+        self.active = [int(np.sum(self.tree_depth > step)) for step in range(self.depth)]
+
+    def apply(self, X):
+        # Leaf index of every (row, tree). Gathers go through flat np.take:
+        # much cheaper than 2-D fancy indexing.
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.int32) * n_features)[:, None]
+        node = np.broadcast_to(self.roots[self.depth_order], (n_rows, len(self.roots))).copy()
+        missing = self.kind == "xgboost" and np.isnan(X).any()
+        for active in self.active:
+            current = node[:, :active]
+            x = np.take(flat, row_base + np.take(self.feature, current))
+            threshold = np.take(self.threshold, current)
+            if self.kind == "xgboost":
+                go_right = ~(x < threshold)
+                if missing:
+                    go_right = np.where(np.isnan(x), ~np.take(self.default_left, current), go_right)
+            else:
+                # sklearn compares float32 inputs against float64 thresholds.
+                go_right = x > threshold
+            node[:, :active] = np.take(self.children, 2 * current + go_right)
+        return node[:, self.depth_restore]
+
+    def _scores(self, X):
+        leaves = self.apply(X)
+        if self.kind == "xgboost":
+            values = np.take(self.value, leaves[:, self.class_order]).astype(np.float64)
+            return np.add.reduceat(values, self.class_starts, axis=1) + self.base_margin
+        # Summed tree by tree, in order, as RandomForestClassifier does.
+        proba = np.zeros((len(X), self.value.shape[1]))
+        for t in range(leaves.shape[1]):
+            proba += self.value[leaves[:, t]]
+        return proba / leaves.shape[1]
+
+    def _matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)].to_numpy()
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def predict_scores(self, X):
+        X = self._matrix(X)
+        step = max(1, MAX_CELLS // len(self.roots))
+        return np.concatenate([self._scores(X[i:i + step]) for i in range(0, len(X), step)]) if len(X) else \
+            np.empty((0, len(self.classes_)))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_scores(X), axis=1)]
+
+def _forest_arrays(model):
+    feature, threshold, children, value, roots, depths = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        ids = np.arange(tree.node_count)
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, 0.0, tree.threshold))
+        children.append(np.stack([np.where(leaf, ids, tree.children_left),
+                                  np.where(leaf, ids, tree.children_right)], axis=1).ravel() + offset)
+        # Normalised the way DecisionTreeClassifier.predict_proba does it.
+        proba = tree.value[:, 0, :].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += tree.node_count
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int32),
+        "default_left": np.zeros(offset, dtype=bool),
+        "value": np.concatenate(value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_depth": np.asarray(depths, dtype=np.int32),
+        "tree_class": np.zeros(len(roots), dtype=np.int32),
+    }, {"kind": "forest", "depth": int(max(depths)), "classes": model.classes_.tolist(),
+        "feature_names": list(model.feature_names_in_)}
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        if not frontier:
+            return depth
+        depth += 1
+
+def _parse_floats(text):
+    return [float(v) for v in str(text).strip("[]").split(",")]
+
+def _xgboost_arrays(model):
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    params = raw["learner_model_param"]
+    trees = raw["gradient_booster"]["model"]["trees"]
+    tree_info = raw["gradient_booster"]["model"]["tree_info"]
+    if any(any(t["split_type"]) for t in trees):
+        raise ValueError("Categorical splits are not supported")
+
+    feature, threshold, children, default_left, value, roots, depths = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        lc = np.asarray(tree["left_children"])
+        rc = np.asarray(tree["right_children"])
+        split = np.asarray(tree["split_conditions"], dtype=np.float32)
+        leaf = lc < 0
+        ids = np.arange(len(lc))
+        feature.append(np.where(leaf, 0, tree["split_indices"]))
+        threshold.append(np.where(leaf, np.float32(0), split))
+        children.append(np.stack([np.where(leaf, ids, lc), np.where(leaf, ids, rc)], axis=1).ravel() + offset)
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        # A leaf's split_condition holds its output value.
+        value.append(np.where(leaf, split, np.float32(0)))
+        roots.append(offset)
+        depths.append(_tree_depth(lc, rc))
+        offset += len(lc)
+
+    base_margin = _parse_floats(params["base_score"])
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float32),
+        "children": np.concatenate(children).astype(np.int32),
+        "default_left": np.concatenate(default_left),
+        "value": np.concatenate(value).astype(np.float32),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_depth": np.asarray(depths, dtype=np.int32),
+        "tree_class": np.asarray(tree_info, dtype=np.int32),
+    }, {"kind": "xgboost", "depth": int(max(depths)), "classes": np.asarray(model.classes_).tolist(),
+        "feature_names": list(booster.feature_names), "base_margin": base_margin}
+
+def export_model(name):
+    model = get_model(name)
+    start = time.perf_counter()
+    if hasattr(model, "get_booster"):
+        arrays, meta = _xgboost_arrays(model)
+    elif hasattr(model, "estimators_"):
+        arrays, meta = _forest_arrays(model)
+    else:
+        raise TypeError(f"Cannot compile a {type(model).__name__}")
+
+    directory = TREES_DIR.format(name)
+    os.makedirs(directory, exist_ok=True)
+    for array_name, array in arrays.items():
+        path = os.path.join(directory, array_name + ".npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(path + ".tmp", path)
+
+    meta.update({
+        "model_sha256": registry.fingerprint(name),
+        "trees": len(arrays["roots"]),
+        "nodes": len(arrays["feature"]),
+        "bytes": int(sum(a.nbytes for a in arrays.values())),
+        "export_seconds": round(time.perf_counter() - start, 3),
+    })
+    # Written last: the registry watches this file.
+    meta_path = os.path.join(directory, "meta.json")
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+def load_compiled(meta_path):
+    # Memory-mapped: worker processes share one page-cached copy.
+    directory = os.path.dirname(meta_path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    # np.asarray drops the memmap subclass (and its per-index overhead) but
+    # keeps the mapping.
+    arrays = {name: np.asarray(np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")) for name in ARRAYS}
+    return CompiledEnsemble(arrays, meta)
+
+for _name in ("gym", "diet"):
+    registry.register(f"{_name}_trees", os.path.join(TREES_DIR.format(_name), "meta.json"), loader=load_compiled)
+
+_validated = {}
+
+def compiled_model(name):
+    trees = f"{name}_trees"
+    if not registry.exists(trees):
+        return None
+    compiled = get_model(trees)
+    # Exported from another model: stale until re-exported.
+    if registry.exists(name) and registry.fingerprint(name) != compiled.meta["model_sha256"]:
+        return None
+    return compiled
+
+def get_predictor(name):
+    compiled = compiled_model(name)
+    if compiled is None:
+        return get_validated_model(name)
+    encoder = get_encoder(name)
+    if _validated.get(name) != (id(compiled), id(encoder)):
+        encoder.validate(compiled)
+        _validated[name] = (id(compiled), id(encoder))
+    return compiled
+
+def verify(name, data_path, samples=None):
+    model = get_model(name)
+    compiled = get_model(f"{name}_trees")
+    data = datasets.load(data_path)
+    if samples:
+        data = data.sample(min(samples, len(data)), random_state=0)
+    X = data[list(compiled.feature_names_in_)].astype(np.float32)
+
+    start = time.perf_counter()
+    expected = np.asarray(model.predict(X))
+    model_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    got = compiled.predict(X)
+    compiled_seconds = time.perf_counter() - start
+    return {
+        "model": name,
+        "rows": len(X),
+        "identical": bool(np.array_equal(expected, got)),
+        "mismatches": int(np.sum(expected != got)),
+        "model_seconds": round(model_seconds, 4),
+        "compiled_seconds": round(compiled_seconds, 4),
+    }
+
+DEFAULT_DATA = {"gym": "data/cleaned_gym_data.csv", "diet": "data/cleaned_diet_data.csv"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile tree ensembles into memory-mapped NumPy node arrays.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("export")
+    build.add_argument("models", nargs="+", choices=["gym", "diet"])
+
+    check = sub.add_parser("verify", help="compare compiled and original predictions on a dataset")
+    check.add_argument("model", choices=["gym", "diet"])
+    check.add_argument("--data")
+    check.add_argument("--samples", type=int)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        print(json.dumps({name: export_model(name) for name in args.models}, indent=2))
+    else:
+        print(json.dumps(verify(args.model, args.data or DEFAULT_DATA[args.model], args.samples), indent=2))
+
+if __name__ == "__main__":
+    main()